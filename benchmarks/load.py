@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+"""
+Load test of contacts and auth API
+
+Application runs on SQLite database with fake Redis, requests are sent through in-process ASGI transport
+or to uvicorn worker started in background thread (--uvicorn). Results are compared with stored baseline:
+
+    python -m benchmarks.load --users 20 --contacts 500
+    python -m benchmarks.load --save-baseline
+"""
+
+BASELINE = Path(__file__).parent / "baseline.json"
+SCENARIOS = ("login", "read_contacts", "search", "upcoming_birthdays", "create", "update")
+PASSWORD = "benchmark-password"
+NAMES = ("John", "Ozzy", "Anna", "Maria", "Peter", "Olga", "Ivan", "Kate", "Max", "Lena")
+SONAMES = ("Wick", "Osborn", "Smith", "Doe", "Brown", "Lee", "Petrenko", "Stark", "Parker", "Banner")
+
+
+def configure_environment(db_path: str, bcrypt_rounds: int) -> None:
+    """
+    Settings for application under test, must be called before application is imported
+    """
+    os.environ["sqlalchemy_database_url"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("secret_key", "benchmark-secret")
+    os.environ.setdefault("algorithm", "HS256")
+    os.environ["bcrypt_rounds"] = str(bcrypt_rounds)
+    os.environ["rate_limit_enabled"] = "false"
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+    :param values: sorted values
+    :param percent: percentile from 0 to 100
+    :return: value of percentile by nearest rank
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """
+    :param latencies: seconds of every request
+    :param errors: number of failed requests
+    :param elapsed: seconds of whole scenario
+    :return: percentiles of latency in milliseconds and requests per second
+    :rtype: dict
+    """
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    :param results: results of scenarios
+    :param baseline: stored results of scenarios
+    :param tolerance: allowed relative change, e.g. 0.2
+    :return: descriptions of regressions, empty if results are not worse than baseline
+    :rtype: list[str]
+    """
+    regressions = []
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if base is None:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: {result['rps']} rps < baseline {base['rps']} rps")
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{scenario}: {result['errors']} errors")
+    return regressions
+
+
+async def seed(users: int, contacts: int) -> list[dict]:
+    """
+    Create users with contacts in database of application
+
+    :param users: number of users
+    :param contacts: number of contacts of every user
+    :return: email, access token and contact ids of every user
+    :rtype: list[dict]
+    """
+    from sqlalchemy import insert, select
+
+    from src.database.db import engine, session
+    from src.database.models import Base, Contact, User, birthday_md
+    from src.services.auth import auth_service
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    password = await auth_service.get_password_hash(PASSWORD)
+    rnd = random.Random(42)
+    accounts = []
+    async with session() as db:
+        await db.execute(insert(User), [
+            {"name": f"user{n}", "email": f"user{n}@example.com", "password": password, "email_confirmed": True}
+            for n in range(users)
+        ])
+        for user_id, email in (await db.execute(select(User.id, User.email))).all():
+            rows = []
+            for n in range(contacts):
+                birthday = datetime.date(1950, 1, 1) + datetime.timedelta(days=rnd.randrange(365 * 50))
+                rows.append({"name": rnd.choice(NAMES), "soname": rnd.choice(SONAMES),
+                             "email": f"contact{n}.{user_id}@example.com", "phone": str(rnd.randrange(10 ** 9)),
+                             "birthday": birthday, "birth_md": birthday_md(birthday), "info": "",
+                             "user_id": user_id})
+            if rows:
+                await db.execute(insert(Contact), rows)
+            accounts.append({"email": email, "user_id": user_id})
+        await db.commit()
+        for account in accounts:
+            ids = await db.scalars(select(Contact.id).where(Contact.user_id == account["user_id"]).limit(100))
+            account["contact_ids"] = list(ids)
+            account["token"] = await auth_service.create_access_token(data={"sub": account["email"]},
+                                                                      expires_delta=3600)
+    return accounts
+
+
+def contact_body(rnd: random.Random) -> dict:
+    return {"name": rnd.choice(NAMES), "soname": rnd.choice(SONAMES),
+            "email": f"new{rnd.randrange(10 ** 9)}@example.com", "phone": str(rnd.randrange(10 ** 9)),
+            "birthday": "1990-05-17", "info": "benchmark"}
+
+
+async def request(client: httpx.AsyncClient, scenario: str, account: dict, rnd: random.Random) -> httpx.Response:
+    headers = {"Authorization": f"Bearer {account['token']}"}
+    if scenario == "login":
+        return await client.post("/auth/auth/login", data={"username": account["email"], "password": PASSWORD})
+    if scenario == "read_contacts":
+        return await client.get("/api/contacts/", params={"limit": 50, "skip": rnd.randrange(5) * 50},
+                                headers=headers)
+    if scenario == "search":
+        return await client.get("/api/contacts/search", params={"q": rnd.choice(NAMES)[:3]}, headers=headers)
+    if scenario == "upcoming_birthdays":
+        return await client.get("/api/contacts/upcoming_birthdays/", headers=headers)
+    if scenario == "create":
+        return await client.post("/api/contacts/", json=contact_body(rnd), headers=headers)
+    if scenario == "update":
+        if not account["contact_ids"]:
+            return await client.post("/api/contacts/", json=contact_body(rnd), headers=headers)
+        contact_id = rnd.choice(account["contact_ids"])
+        return await client.put(f"/api/contacts/{contact_id}", json=contact_body(rnd), headers=headers)
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, accounts: list[dict], requests: int,
+                       concurrency: int) -> dict:
+    """
+    Send requests of scenario by concurrent clients
+
+    :return: summary of latencies
+    :rtype: dict
+    """
+    rnd = random.Random(scenario)
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await request(client, scenario, rnd.choice(accounts), rnd)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def use_fake_redis() -> None:
+    from fakeredis.aioredis import FakeRedis
+
+    from src.services.cache import contacts_cache, user_cache
+    from src.services.email import mail_queue
+    from src.services.rate_limit import rate_limiter
+
+    redis = FakeRedis()
+    user_cache.redis = contacts_cache.redis = mail_queue.redis = rate_limiter.redis = redis
+
+
+def start_uvicorn(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def benchmark(args) -> dict:
+    use_fake_redis()
+    from main import app
+
+    accounts = await seed(args.users, args.contacts)
+    server = None
+    if args.uvicorn:
+        server, thread = start_uvicorn(app, args.port)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    results = {}
+    try:
+        async with client:
+            for scenario in args.scenarios:
+                # warm up caches and connection pool
+                await run_scenario(client, scenario, accounts, min(args.requests, 20), args.concurrency)
+                results[scenario] = await run_scenario(client, scenario, accounts, args.requests, args.concurrency)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+    return results
+
+
+def print_results(results: dict, baseline: dict) -> None:
+    print(f"{'scenario':<20}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'p95 vs base':>13}")
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        change = f"{(result['p95_ms'] / base['p95_ms'] - 1) * 100:+.1f}%" if base and base["p95_ms"] else "-"
+        print(f"{scenario:<20}{result['rps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['errors']:>8}{change:>13}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test of contacts and auth API")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=200, help="contacts of every user")
+    parser.add_argument("--requests", type=int, default=300, help="requests of every scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--uvicorn", action="store_true", help="send requests to uvicorn worker over HTTP")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as folder:
+        configure_environment(os.path.join(folder, "benchmark.db"), args.bcrypt_rounds)
+        results = asyncio.run(benchmark(args))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print_results(results, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
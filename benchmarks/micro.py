@@ -0,0 +1,115 @@
+import argparse
+import datetime
+import os
+import timeit
+import tracemalloc
+
+"""
+Micro-benchmarks of serialization hot paths with allocation report
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --size 1000 --only contacts_validated contacts_fast
+"""
+
+
+def configure_environment() -> None:
+    """
+    Settings for imported application modules, must be called before they are imported
+    """
+    os.environ.setdefault("sqlalchemy_database_url", "sqlite:///./benchmark.db")
+    os.environ.setdefault("secret_key", "benchmark-secret")
+    os.environ.setdefault("algorithm", "HS256")
+
+
+def measure(fn, repeat: int, number: int) -> dict:
+    """
+    :param fn: function without arguments
+    :param repeat: number of timing runs, best run is reported
+    :param number: calls of function in every run
+    :return: time of one call in microseconds, peak memory of one call and blocks kept by its result
+    :rtype: dict
+    """
+    fn()
+    best = min(timeit.repeat(fn, repeat=repeat, number=number)) / number
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        del result
+    finally:
+        tracemalloc.stop()
+    # blocks still alive after call: result and everything cached by call
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return {
+        "us_per_call": round(best * 1e6, 2),
+        "calls_per_sec": round(1 / best) if best else 0,
+        "peak_kib": round(peak / 1024, 1),
+        "kept_blocks": sum(max(stat.count_diff, 0) for stat in stats),
+        "top": [(str(stat.traceback), stat.size_diff) for stat in
+                sorted(stats, key=lambda stat: stat.size_diff, reverse=True)[:3]],
+    }
+
+
+def cases(size: int) -> dict:
+    from pydantic import TypeAdapter
+
+    from src.database.models import Contact, User
+    from src.schemas import ContactResponse, UserDb
+    from src.services.auth import auth_service
+    from src.services.serialization import contact_rows_json
+
+    rows = [(n, f"Name{n}", f"Soname{n}", f"contact{n}@example.com", str(380_000_000 + n),
+             datetime.date(1950, 1, 1) + datetime.timedelta(days=n % 18000), "info") for n in range(size)]
+    contacts = [Contact(id=r[0], name=r[1], soname=r[2], email=r[3], phone=r[4], birthday=r[5], info=r[6])
+                for r in rows]
+    contact_list = TypeAdapter(list[ContactResponse])
+    user = User(id=1, name="bench", email="bench@example.com", password="hash", update_token="token",
+                avatar="http://avatar", email_confirmed=True)
+    user_db = TypeAdapter(UserDb)
+    payload = {"sub": "bench@example.com", "iat": datetime.datetime.now(),
+               "exp": datetime.datetime.now() + datetime.timedelta(minutes=15), "scope": "access_token"}
+    token = auth_service.jwt_backend.encode(payload)
+
+    def decode_uncached():
+        auth_service.token_cache.clear()
+        return auth_service.decode_access_token(token)
+
+    return {
+        "contacts_validated": lambda: contact_list.dump_json(contact_list.validate_python(contacts,
+                                                                                          from_attributes=True)),
+        "contacts_fast": lambda: contact_rows_json(rows),
+        "user_db": lambda: user_db.dump_json(user_db.validate_python(user, from_attributes=True)),
+        "jwt_encode": lambda: auth_service.jwt_backend.encode(payload),
+        "jwt_decode": decode_uncached,
+        "jwt_decode_cached": lambda: auth_service.decode_access_token(token),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of serialization hot paths")
+    parser.add_argument("--size", type=int, default=500, help="contacts in list")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=50)
+    parser.add_argument("--only", nargs="+", help="names of cases")
+    parser.add_argument("--top", action="store_true", help="print lines with biggest allocations")
+    args = parser.parse_args(argv)
+    configure_environment()
+    print(f"{'case':<20}{'us/call':>12}{'calls/s':>10}{'peak KiB':>10}{'kept blocks':>13}")
+    for name, fn in cases(args.size).items():
+        if args.only and name not in args.only:
+            continue
+        result = measure(fn, args.repeat, args.number)
+        print(f"{name:<20}{result['us_per_call']:>12}{result['calls_per_sec']:>10}{result['peak_kib']:>10}"
+              f"{result['kept_blocks']:>13}")
+        if args.top:
+            for line, size in result["top"]:
+                print(f"    {size:>10} B  {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,16 @@
-import redis.asyncio as redis
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
-from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.Settings import settings
-from src.routes import contacts, auth, users
+from src.database.db import replica_set
+from src.routes import contacts, auth, users, service
+from src.services.auth import auth_service
+from src.services.avatars import avatar_service
+from src.services.cache import user_cache
+from src.services.metrics import MetricsMiddleware, metrics_endpoint
 
 """
 Main module
@@ -15,6 +20,7 @@ app = FastAPI()
 app.include_router(contacts.router, prefix='/api')
 app.include_router(auth.router, prefix='/auth')
 app.include_router(users.router, prefix='/user')
+app.include_router(service.router)
 
 origins = [
     "http://localhost:8000"
@@ -28,11 +34,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
 
 @app.on_event("startup")
 async def startup():
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
+    app.state.user_cache_listener = asyncio.create_task(user_cache.listen_invalidations())
+    if replica_set.engines:
+        app.state.replica_monitor = asyncio.create_task(replica_set.monitor(settings.db_replica_check_interval))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.user_cache_listener.cancel()
+    if replica_set.engines:
+        app.state.replica_monitor.cancel()
+    auth_service.password_hasher.shutdown()
+    avatar_service.shutdown()
 
 
 @app.get("/")
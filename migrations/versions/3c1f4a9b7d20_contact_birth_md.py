@@ -0,0 +1,32 @@
+"""contact birthday month-day
+
+Revision ID: 3c1f4a9b7d20
+Revises: af9e385787d3
+Create Date: 2026-10-18 10:12:41.512304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f4a9b7d20'
+down_revision: Union[str, None] = 'af9e385787d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birth_md', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE contacts SET birth_md = EXTRACT(MONTH FROM birth_day) * 100 + EXTRACT(DAY FROM birth_day) "
+        "WHERE birth_day IS NOT NULL"
+    )
+    op.create_index('ix_contacts_user_id_birth_md', 'contacts', ['user_id', 'birth_md'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birth_md', table_name='contacts')
+    op.drop_column('contacts', 'birth_md')
@@ -0,0 +1,33 @@
+"""contacts changes
+
+Revision ID: 5e0b7f3a2c91
+Revises: c47a9e2d1b83
+Create Date: 2026-10-18 15:40:12.663018
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0b7f3a2c91'
+down_revision: Union[str, None] = 'c47a9e2d1b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False,
+                                        server_default=sa.func.now()))
+    op.add_column('contacts', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.alter_column('contacts', 'updated_at', server_default=None)
+    op.create_index('ix_contacts_user_id_updated_at', 'contacts', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_updated_at', table_name='contacts')
+    op.execute("DELETE FROM contacts WHERE deleted_at IS NOT NULL")
+    op.drop_column('contacts', 'deleted_at')
+    op.drop_column('contacts', 'updated_at')
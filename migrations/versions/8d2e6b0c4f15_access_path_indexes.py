@@ -0,0 +1,33 @@
+"""access path indexes
+
+Revision ID: 8d2e6b0c4f15
+Revises: 3c1f4a9b7d20
+Create Date: 2026-10-18 11:03:27.904115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e6b0c4f15'
+down_revision: Union[str, None] = '3c1f4a9b7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # fails if users table already has duplicated emails, they should be merged before upgrade
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_soname_name', 'contacts', ['user_id', 'soname', 'name'], unique=False)
+    op.create_index('ix_contacts_user_id_email', 'contacts', ['user_id', 'email'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_soname_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
+    op.drop_index('ix_users_email', table_name='users')
@@ -0,0 +1,72 @@
+"""contacts hash partitions
+
+Revision ID: 9b4d1e7c2a60
+Revises: 5e0b7f3a2c91
+Create Date: 2026-10-18 18:02:47.115204
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from src.Settings import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4d1e7c2a60'
+down_revision: Union[str, None] = '5e0b7f3a2c91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_contacts_user_id_id', ['user_id', 'id']),
+    ('ix_contacts_user_id_soname_name', ['user_id', 'soname', 'name']),
+    ('ix_contacts_user_id_email', ['user_id', 'email']),
+    ('ix_contacts_user_id_birth_md', ['user_id', 'birth_md']),
+    ('ix_contacts_user_id_updated_at', ['user_id', 'updated_at']),
+)
+SEARCH_COLUMNS = ("name", "soname", "email", "phone_number", "Info")
+
+
+def _partitions() -> int:
+    # alembic -x contacts_partitions=16 upgrade head, default from db_contacts_partitions setting
+    return int(context.get_x_argument(as_dictionary=True).get('contacts_partitions', settings.db_contacts_partitions))
+
+
+def _is_partitioned() -> bool:
+    return op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'contacts'::regclass)")).scalar()
+
+
+def _rebuild(primary_key: list[str], partition_clause: str, partitions: int) -> None:
+    # copy rows to new table, constraints and indexes are created after old table dropped to keep their names
+    op.execute("ALTER TABLE contacts RENAME TO contacts_old")
+    op.execute(f"CREATE TABLE contacts (LIKE contacts_old INCLUDING DEFAULTS){partition_clause}")
+    for remainder in range(partitions):
+        op.execute(f"CREATE TABLE contacts_p{remainder} PARTITION OF contacts "
+                   f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})")
+    op.execute("INSERT INTO contacts SELECT * FROM contacts_old")
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id")
+    op.drop_table('contacts_old')
+    op.create_primary_key('contacts_pkey', 'contacts', primary_key)
+    op.create_foreign_key('contacts_user_id_fkey', 'contacts', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+    for name, columns in INDEXES:
+        op.create_index(name, 'contacts', columns, unique=False)
+    for column in SEARCH_COLUMNS:
+        op.create_index(f'ix_contacts_{column.lower()}_trgm', 'contacts', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def upgrade() -> None:
+    partitions = _partitions()
+    if op.get_bind().dialect.name != 'postgresql' or partitions < 1 or _is_partitioned():
+        return
+    # primary key of partitioned table must contain partition key
+    _rebuild(['id', 'user_id'], " PARTITION BY HASH (user_id)", partitions)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql' or not _is_partitioned():
+        return
+    _rebuild(['id'], "", 0)
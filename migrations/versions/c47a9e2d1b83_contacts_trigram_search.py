@@ -0,0 +1,36 @@
+"""contacts trigram search
+
+Revision ID: c47a9e2d1b83
+Revises: 8d2e6b0c4f15
+Create Date: 2026-10-18 12:21:05.337802
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a9e2d1b83'
+down_revision: Union[str, None] = '8d2e6b0c4f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ("name", "soname", "email", "phone_number", "Info")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        op.create_index(f'ix_contacts_{column.lower()}_trgm', 'contacts', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_contacts_{column.lower()}_trgm', table_name='contacts')
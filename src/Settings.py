@@ -3,18 +3,64 @@ from pydantic.v1 import BaseSettings
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_contacts_partitions: int = 0
+    db_replica_urls: list[str] = []
+    db_read_your_writes: float = 5
+    db_replica_check_interval: float = 10
+    db_replica_check_timeout: float = 2
     secret_key: str = None
     algorithm: str = None
+    jwt_backend: str = "jose"
+    jwt_cache_size: int = 4096
+    bcrypt_rounds: int = 12
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = 4
+    password_hash_queue: int = 64
     mail_username: str = ""
     mail_password: str = ""
     mail_from: str = "a@a.com"
     mail_port: int = 0
     mail_server: str = ""
+    mail_ssl_tls: bool = True
+    mail_starttls: bool = False
+    mail_timeout: float = 30
+    mail_pool_size: int = 2
+    mail_batch_size: int = 20
+    mail_max_attempts: int = 5
+    mail_retry_base: float = 2
+    mail_retry_cap: float = 300
+    mail_worker_lease: float = 60
     redis_host: str = 'localhost'
     redis_port: int = 6379
+    redis_max_connections: int = 50
+    user_cache_ttl: int = 900
+    user_cache_local_size: int = 1024
+    user_cache_local_ttl: float = 30
+    contacts_cache_ttl: int = 60
+    contacts_version_ttl: int = 300
+    fast_serialization: bool = True
+    sync_overlap: float = 60
+    metrics_enabled: bool = True
+    server_timing: bool = True
+    service_token: str = ""
+    rate_limit_enabled: bool = True
+    rate_limits: dict[str, str] = {}
+    rate_limit_batch: int = 1
+    rate_limit_cooldown: float = 5
     cloudinary_name: str = None
     cloudinary_api_key: str = None
     cloudinary_api_secret: str = None
+    avatar_storage: str = "cloudinary"
+    avatar_local_dir: str = "static/avatars"
+    avatar_base_url: str = "/static/avatars"
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_size: int = 250
+    avatar_workers: int = 2
 
     class Config:
         env_file = ".env"
@@ -1,23 +1,135 @@
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import make_url, Select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.orm import Session
 
 from src.Settings import settings
-
-DB_URL = settings.sqlalchemy_database_url
-
-engine = create_engine(DB_URL)
-session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+from src.database.pool import MeteredAsyncPool
+from src.database.replicas import ReplicaSet
+from src.services.metrics import instrument_engine
+from src.services.redis_client import redis_client
 
 """
 Create Session for access to DB
 """
-def get_db():
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Convert synchronous database URL to URL with async driver
+
+    :param url: database URL from settings (driver may be omitted or synchronous)
+    :return: database URL with async driver
+    :rtype: str
+    """
+    db_url = make_url(url)
+    backend = db_url.get_backend_name()
+    if backend in ASYNC_DRIVERS and db_url.drivername != ASYNC_DRIVERS[backend]:
+        db_url = db_url.set(drivername=ASYNC_DRIVERS[backend])
+    return db_url.render_as_string(hide_password=False)
+
+
+def create_db_engine(url: str) -> AsyncEngine:
+    """
+    Create async engine with connection pool configured from settings, SQL statements are measured if
+    metrics are enabled
+
+    :param url: database URL
+    :return: async engine
+    :rtype: AsyncEngine
+    """
+    db_engine = create_async_engine(
+        to_async_url(url),
+        poolclass=MeteredAsyncPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if settings.metrics_enabled:
+        instrument_engine(db_engine)
+    return db_engine
+
+
+def pool_stats(db_engine: AsyncEngine) -> dict:
+    """
+    Get usage statistic of engine connection pool
+
+    :param db_engine: async engine
+    :return: checked out, idle and overflow connections with wait times
+    :rtype: dict
+    """
+    return db_engine.sync_engine.pool.stats()
+
+
+class RoutingSession(Session):
     """
-    :return: instance of Session object
-    :type: Session
+    Session which sends SELECT statements to replica engine set in info["replica"]
+
+    Other statements go to bound (primary) engine, after first write all statements of session go to primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = self.info.get("replica")
+        is_read = isinstance(clause, Select) and clause._for_update_arg is None
+        if replica is not None and is_read and not self._flushing and not self.info.get("wrote"):
+            return replica.sync_engine
+        if self._flushing or (clause is not None and not is_read):
+            self.info["wrote"] = True
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+# synchronous URL kept for Alembic migrations
+DB_URL = settings.sqlalchemy_database_url
+ASYNC_DB_URL = to_async_url(DB_URL)
+
+engine = create_db_engine(DB_URL)
+session = async_sessionmaker(bind=engine, class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False,
+                             expire_on_commit=False)
+replica_set = ReplicaSet([create_db_engine(url) for url in settings.db_replica_urls], redis_client,
+                         window=settings.db_read_your_writes, timeout=settings.db_replica_check_timeout)
+
+
+async def get_db(request: Request):
+    """
+    Session of request, reads of GET requests may go to replica after use_replica
+
+    :param request: request from client
+    :return: instance of AsyncSession object
+    :type: AsyncSession
     """
-    db = session()
-    try:
+    async with session() as db:
+        db.info["read_only"] = request.method in ("GET", "HEAD")
         yield db
-    finally:
-        db.close()
+        if db.info.get("wrote") and db.info.get("user_id") is not None and replica_set.engines:
+            await replica_set.mark_write(db.info["user_id"])
+
+
+async def use_replica(db: AsyncSession, user_id: int) -> None:
+    """
+    Send reads of read-only request to replica unless user changed data within read-your-writes window
+
+    :param db: session of request
+    :param user_id: current user
+    :return: Nothing return
+    :rtype: None
+    """
+    db.info["user_id"] = user_id
+    if db.info.get("read_only") and replica_set.engines:
+        db.info["replica"] = await replica_set.choose(user_id)
+
+
+def get_session_factory() -> async_sessionmaker:
+    """
+    Session factory for work which outlives request dependencies (e.g. streaming response body)
+
+    :return: factory of AsyncSession objects
+    :rtype: async_sessionmaker
+    """
+    return session
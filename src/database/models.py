@@ -1,6 +1,8 @@
-from sqlalchemy import Column, String, Integer, Date, ForeignKey, Boolean
+import datetime
+
+from sqlalchemy import Column, String, Integer, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 
 """
 Models of Objects in DB
@@ -8,6 +10,30 @@ Models of Objects in DB
 
 Base = declarative_base()
 
+# columns of contacts used in fuzzy search, indexed by trigram GIN indexes on PostgreSQL
+SEARCH_COLUMNS = ("name", "soname", "email", "phone_number", "Info")
+
+
+def birthday_md(birthday: datetime.date | None) -> int | None:
+    """
+    Convert birthday to month-day number (MMDD), e.g. 22 August -> 822
+
+    :param birthday: birthday date
+    :return: month-day number or None if birthday unknown
+    :rtype: int | None
+    """
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
+
+
+def utcnow() -> datetime.datetime:
+    """
+    :return: current time in UTC
+    :rtype: datetime.datetime
+    """
+    return datetime.datetime.now(datetime.timezone.utc)
+
 
 class Contact(Base):
     """
@@ -20,9 +46,26 @@ class Contact(Base):
     :param phone: contact phone number
     :param birthday: contact birthday date
     :param info: contact additional information
+    :param birth_md: birthday month-day number (MMDD) for search of upcoming birthdays
+    :param updated_at: time of last change of contact (UTC)
+    :param deleted_at: time when contact deleted (UTC), deleted contacts are kept for sync of clients
     :param user_id: user id of contact owner (related to user table)
+    :param users: owner of contact, never loaded implicitly, use selectinload(Contact.users) to load it
+
+    On PostgreSQL table may be hash partitioned by user_id (db_contacts_partitions setting), every query
+    of contacts is filtered by user_id for partition pruning.
     """
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_soname_name", "user_id", "soname", "name"),
+        Index("ix_contacts_user_id_email", "user_id", "email"),
+        Index("ix_contacts_user_id_birth_md", "user_id", "birth_md"),
+        Index("ix_contacts_user_id_updated_at", "user_id", "updated_at"),
+        *(Index(f"ix_contacts_{column.lower()}_trgm", column, postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+          for column in SEARCH_COLUMNS),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String(50), nullable=False)
     soname = Column(String(50), nullable=False)
@@ -30,8 +73,20 @@ class Contact(Base):
     phone = Column("phone_number", String(30))
     birthday = Column("birth_day", Date)
     info = Column("Info", String(250), nullable=True)
+    birth_md = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    users = relationship("User", back_populates="contacts")
+    users = relationship("User", back_populates="contacts", lazy="raise")
+
+    # ORM identity includes partition key, so UPDATE/DELETE of loaded contacts filter by user_id
+    # and touch one partition when table is hash partitioned (see migration 9b4d1e7c2a60)
+    __mapper_args__ = {"primary_key": [id, user_id]}
+
+    @validates("birthday")
+    def _set_birth_md(self, key, birthday):
+        self.birth_md = birthday_md(birthday)
+        return birthday
 
 
 class User(Base):
@@ -45,14 +100,15 @@ class User(Base):
     :param update_token: JWT token for update security token
     :param avatar: URL for avatar image location
     :param email_confirmed: identification that user confirm his email
+    :param contacts: contacts of user, never loaded implicitly, use selectinload(User.contacts) to load them
     """
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, nullable=False)
     name = Column(String(50), nullable=False)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False, unique=True, index=True)
     password = Column(String(100), nullable=False)
     update_token = Column(String)
-    contacts = relationship("Contact", back_populates="users")
+    contacts = relationship("Contact", back_populates="users", lazy="raise", passive_deletes=True)
     avatar = Column(String, default=None)
     email_confirmed = Column(Boolean, default=False)
 
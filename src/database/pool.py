@@ -0,0 +1,97 @@
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+"""
+Connection pool with usage metrics
+"""
+
+# checkout in progress in current task, QueuePool._do_get calls itself again when overflow changed
+_in_checkout: ContextVar[bool] = ContextVar("pool_checkout", default=False)
+
+
+class PoolMetrics:
+    """
+    Class PoolMetrics collect statistic of connection checkouts from pool
+
+    :param checkouts: how many times connection was requested from pool
+    :param timeouts: how many requests failed by pool timeout
+    :param wait_total: total time (seconds) spent waiting for connection
+    :param wait_max: longest wait (seconds) for connection
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe_wait(self, seconds: float) -> None:
+        """
+        Register one checkout from pool
+
+        :param seconds: time spent to get connection
+        :return: Nothing return
+        :rtype: None
+        """
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self, pool: AsyncAdaptedQueuePool) -> dict:
+        """
+        Current state of pool together with collected statistic
+
+        :param pool: pool for which metrics collected
+        :return: dictionary with pool state and wait times in milliseconds
+        :rtype: dict
+        """
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class MeteredAsyncPool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool which measure how long every checkout waits for connection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "MeteredAsyncPool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        # measure only outer call of every checkout, concurrent checkouts run in their own contexts
+        if _in_checkout.get():
+            return super()._do_get()
+        token = _in_checkout.set(True)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - start)
+            _in_checkout.reset(token)
+
+    def stats(self) -> dict:
+        """
+        :return: current pool state with wait statistic
+        :rtype: dict
+        """
+        return self.metrics.snapshot(self)
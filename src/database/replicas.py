@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import URL, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+"""
+Read replicas of database with health checks and read-your-writes window of users
+"""
+
+
+class ReplicaSet:
+    """
+    Engines of read replicas, healthy replicas are used by turn
+
+    User who changed data is served from primary for window seconds, so the user sees own changes even if
+    replicas lag behind. Time of last write is kept by worker and in Redis for other workers.
+
+    :param engines: engines of replicas
+    :param redis: Redis client
+    :param window: read-your-writes window (seconds)
+    :param timeout: seconds to wait for replica in health check
+    """
+
+    def __init__(self, engines: list[AsyncEngine], redis: Redis, window: float = 5, timeout: float = 2):
+        self.engines = engines
+        self.redis = redis
+        self.window = window
+        self.timeout = timeout
+        self.healthy = [True] * len(engines)
+        self.reads = [0] * len(engines)
+        self.primary_reads = 0
+        self._next = 0
+        self._writes: dict[int, float] = {}
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"db:recent_write:{user_id}"
+
+    async def mark_write(self, user_id: int) -> None:
+        """
+        Start read-your-writes window of user
+
+        :param user_id: user who changed data
+        :return: Nothing return
+        :rtype: None
+        """
+        self._writes[user_id] = time.monotonic() + self.window
+        try:
+            await self.redis.set(self.key(user_id), 1, px=int(self.window * 1000))
+        except RedisError:
+            pass
+
+    async def recently_wrote(self, user_id: int) -> bool:
+        """
+        :param user_id: user
+        :return: True if user changed data within window, also True if it is unknown because Redis failed
+        :rtype: bool
+        """
+        until = self._writes.get(user_id)
+        if until is not None:
+            if until > time.monotonic():
+                return True
+            del self._writes[user_id]
+        try:
+            return bool(await self.redis.exists(self.key(user_id)))
+        except RedisError:
+            return True
+
+    async def choose(self, user_id: int) -> AsyncEngine | None:
+        """
+        :param user_id: user whose request is served
+        :return: healthy replica for reads or None if reads should go to primary
+        :rtype: AsyncEngine | None
+        """
+        healthy = [i for i, ok in enumerate(self.healthy) if ok]
+        if not healthy or await self.recently_wrote(user_id):
+            self.primary_reads += 1
+            return None
+        index = healthy[self._next % len(healthy)]
+        self._next += 1
+        self.reads[index] += 1
+        return self.engines[index]
+
+    async def _ping(self, engine: AsyncEngine) -> bool:
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except Exception:
+            return False
+        return True
+
+    async def check(self) -> list[bool]:
+        """
+        Check connection to every replica, failed replicas are not used until next successful check
+
+        :return: health of replicas
+        :rtype: list[bool]
+        """
+        self.healthy = list(await asyncio.gather(*(self._ping(engine) for engine in self.engines)))
+        return self.healthy
+
+    async def monitor(self, interval: float = 10) -> None:
+        """
+        Check replicas every interval seconds, run as background task of worker
+
+        :param interval: seconds between checks
+        :return: Nothing return
+        :rtype: None
+        """
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    def stats(self) -> list[dict]:
+        """
+        :return: URL without credentials, health, number of reads and pool state of every replica
+        :rtype: list[dict]
+        """
+        return [{"url": URL.create(engine.url.drivername, host=engine.url.host, port=engine.url.port,
+                                   database=engine.url.database).render_as_string(), "healthy": healthy,
+                 "reads": reads,
+                 "pool": engine.sync_engine.pool.stats() if hasattr(engine.sync_engine.pool, "stats") else None}
+                for engine, healthy, reads in zip(self.engines, self.healthy, self.reads)]
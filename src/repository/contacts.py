@@ -1,17 +1,35 @@
+import base64
+import calendar
 import datetime
-from typing import Type
+from typing import Type, AsyncIterator
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, func, or_, case, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Contact, User
-from src.schemas import ContactModel
+from src.database.models import Contact, User, birthday_md, utcnow
+from src.schemas import ContactModel, ContactPatch, ContactFilter
+from src.services.cache import contacts_cache
 
 """
 Access to contacts  
 """
 
 
-async def get_all_contacts(db: Session, user: User, skip: int = 0, limit: int = 100) -> list[Type[Contact]]:
+CONTACT_ROW_COLUMNS = (Contact.id, Contact.name, Contact.soname, Contact.email, Contact.phone, Contact.birthday,
+                       Contact.info)
+
+
+async def _fetch_contacts(db: AsyncSession, stmt, rows: bool) -> list:
+    # row tuples skip ORM identity map and attribute instrumentation, used for JSON list responses
+    if rows:
+        result = await db.execute(stmt.with_only_columns(*CONTACT_ROW_COLUMNS))
+        return result.all()
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def get_all_contacts(db: AsyncSession, user: User, skip: int = 0, limit: int = 100,
+                           rows: bool = False) -> list[Type[Contact]]:
     """
     Get all contacts for user
 
@@ -19,14 +37,109 @@ async def get_all_contacts(db: Session, user: User, skip: int = 0, limit: int =
     :param user: Object User for whom need get contacts
     :param skip: offset for first contact in result
     :param limit: how many records should result limited
+    :param rows: return row tuples of CONTACT_ROW_COLUMNS instead of Contact objects
     :return: contacts for given user
     :rtype: list[Contacts]
     """
-    result = db.query(Contact).filter_by(user_id=user.id).offset(skip).limit(limit).all()
-    return result
+    stmt = select(Contact).filter_by(user_id=user.id, deleted_at=None).offset(skip).limit(limit)
+    return await _fetch_contacts(db, stmt, rows)
+
+
+async def stream_contacts(db: AsyncSession, user: User, batch_size: int = 500) -> AsyncIterator[list[Contact]]:
+    """
+    Read all contacts of user by server-side cursor, batch by batch
+
+    :param db: connection to DB
+    :param user: Object User for whom need get contacts
+    :param batch_size: number of contacts fetched from DB at once
+    :return: async iterator of contact batches
+    :rtype: AsyncIterator[list[Contact]]
+    """
+    stmt = select(Contact).filter_by(user_id=user.id, deleted_at=None).order_by(Contact.id) \
+        .execution_options(yield_per=batch_size)
+    result = await db.stream_scalars(stmt)
+    async for partition in result.partitions():
+        yield partition
+
+
+async def get_changes(db: AsyncSession, user: User, since: datetime.datetime, after_id: int = 0,
+                      limit: int = 500) -> list[Type[Contact]]:
+    """
+    Get contacts (including deleted) changed after given moment, ordered by (updated_at, id)
+
+    :param db: connection to DB
+    :param user: owner of contacts
+    :param since: updated_at of last change known by client
+    :param after_id: id of last change known by client with updated_at equal to since
+    :param limit: max number of changes
+    :return: changed contacts
+    :rtype: list[Contact]
+    """
+    stmt = select(Contact).where(Contact.user_id == user.id,
+                                 tuple_(Contact.updated_at, Contact.id) > tuple_(since, after_id)) \
+        .order_by(Contact.updated_at, Contact.id).limit(limit)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    Make opaque cursor pointing after given contact
+
+    :param contact_id: id of last contact on page
+    :return: cursor string
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(str(contact_id).encode()).decode().rstrip("=")
 
 
-async def get_contact_by_id(db: Session, contact_id: int, user: User) -> Type[Contact] | None:
+MAX_ID = 2 ** 63 - 1
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Get contact id from cursor made by encode_cursor
+
+    :param cursor: cursor string
+    :return: id of last contact on previous page
+    :rtype: int
+    :raises ValueError: if cursor is damaged or id is out of range of BIGINT
+    """
+    try:
+        contact_id = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except ValueError as err:
+        raise ValueError("Invalid cursor") from err
+    if not 0 <= contact_id <= MAX_ID:
+        raise ValueError("Invalid cursor")
+    return contact_id
+
+
+async def get_contacts_page(db: AsyncSession, user: User, limit: int = 100, cursor: str | None = None) -> tuple[
+    list[Type[Contact]], str | None]:
+    """
+    Get page of contacts for user using keyset pagination by (user_id, id)
+
+    :param db: connection to DB
+    :param user: Object User for whom need get contacts
+    :param limit: max contacts on page
+    :param cursor: cursor from previous page, None for first page
+    :return: contacts on page and cursor for next page (None if it is last page)
+    :rtype: tuple[list[Contact], str | None]
+    """
+    stmt = select(Contact).filter_by(user_id=user.id, deleted_at=None)
+    if cursor:
+        stmt = stmt.where(Contact.id > decode_cursor(cursor))
+    stmt = stmt.order_by(Contact.id).limit(limit + 1)
+    result = await db.execute(stmt)
+    contacts = list(result.scalars().all())
+    next_cursor = None
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        next_cursor = encode_cursor(contacts[-1].id)
+    return contacts, next_cursor
+
+
+async def get_contact_by_id(db: AsyncSession, contact_id: int, user: User) -> Type[Contact] | None:
     """
     Find contact by contact ID
 
@@ -36,11 +149,13 @@ async def get_contact_by_id(db: Session, contact_id: int, user: User) -> Type[Co
     :return: contact information or None if no result
     :rtype: Contact | None
     """
-    return db.query(Contact).filter_by(id=contact_id, user_id=user.id).first()
+    stmt = select(Contact).filter_by(id=contact_id, user_id=user.id, deleted_at=None)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
 
 
-async def get_contact_(db: Session, name: str | None, soname: str | None, email: str | None, user: User) -> list[
-    Type[Contact]]:
+async def get_contact_(db: AsyncSession, name: str | None, soname: str | None, email: str | None, user: User,
+                       rows: bool = False) -> list[Type[Contact]]:
     """
     Find contact use one or more keys (name, soname, email)
 
@@ -49,24 +164,60 @@ async def get_contact_(db: Session, name: str | None, soname: str | None, email:
     :param soname: soname of contact
     :param email: contact email
     :param user: owner of contacts
+    :param rows: return row tuples of CONTACT_ROW_COLUMNS instead of Contact objects
     :return: list of correspond contact
     :rtype: List[Contact]
     """
-    res = db.query(Contact).filter_by(user_id=user.id)
+    stmt = select(Contact).filter_by(user_id=user.id, deleted_at=None)
     if name:
-        res = res.filter_by(name=name)
+        stmt = stmt.filter_by(name=name)
 
     if soname:
-        res = res.filter_by(soname=soname)
+        stmt = stmt.filter_by(soname=soname)
 
     if email:
-        res = res.filter_by(email=email)
-    return res.all()
+        stmt = stmt.filter_by(email=email)
+    return await _fetch_contacts(db, stmt, rows)
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def search_contacts(db: AsyncSession, q: str, user: User, limit: int = 20,
+                          rows: bool = False) -> list[Type[Contact]]:
+    """
+    Fuzzy search of contacts by name, soname, email, phone and info
+
+    On PostgreSQL uses pg_trgm similarity (GIN trigram indexes), contacts with prefix match go first,
+    then contacts ordered by best similarity. Other databases fall back to case-insensitive substring search.
+
+    :param db: connection to DB
+    :param q: text to search
+    :param user: owner of contacts
+    :param limit: max number of contacts in result
+    :param rows: return row tuples of CONTACT_ROW_COLUMNS instead of Contact objects
+    :return: list of found contacts, best matches first
+    :rtype: List[Contact]
+    """
+    columns = (Contact.name, Contact.soname, Contact.email, Contact.phone, Contact.info)
+    prefix = f"{_like_escape(q)}%"
+    prefix_match = or_(*(column.ilike(prefix, escape="\\") for column in columns))
+    stmt = select(Contact).filter_by(user_id=user.id, deleted_at=None)
+    if db.get_bind().dialect.name == "postgresql":
+        score = func.greatest(*(func.similarity(column, q) for column in columns))
+        stmt = stmt.where(or_(prefix_match, *(column.op("%")(q) for column in columns)))
+        stmt = stmt.order_by(case((prefix_match, 0), else_=1), score.desc(), Contact.id)
+    else:
+        contains = f"%{_like_escape(q)}%"
+        stmt = stmt.where(or_(*(column.ilike(contains, escape="\\") for column in columns)))
+        stmt = stmt.order_by(case((prefix_match, 0), else_=1), Contact.id)
+    return await _fetch_contacts(db, stmt.limit(limit), rows)
 
 
-async def delete_contact(db: Session, contact_id: int, user: User) -> Contact | None:
+async def delete_contact(db: AsyncSession, contact_id: int, user: User) -> Contact | None:
     """
-     Delete contact from DB
+     Delete contact, contact is kept as tombstone for sync of clients
 
     :param db: connection to DB
     :param contact_id: id of looking contact
@@ -74,14 +225,84 @@ async def delete_contact(db: Session, contact_id: int, user: User) -> Contact |
     :return: contact which removed from DB
     :rtype: Contact
     """
-    contact = db.query(Contact).filter(contact_id=Contact.id, user_id=user.id).first()
+    contact = await get_contact_by_id(db, contact_id, user)
     if contact:
-        db.delete(contact)
-        db.commit()
+        contact.deleted_at = utcnow()
+        await db.commit()
+        await contacts_cache.bump(user.id)
     return contact
 
 
-async def update_contact_by_id(db: Session, contact_id: int, body: ContactModel, user: User) -> Contact | None:
+def _batch_criteria(user: User, ids: list[int] | None, contact_filter: ContactFilter | None) -> list:
+    criteria = [Contact.user_id == user.id, Contact.deleted_at.is_(None)]
+    if ids is not None:
+        criteria.append(Contact.id.in_(ids))
+    if contact_filter is not None:
+        criteria.extend(getattr(Contact, key) == value
+                        for key, value in contact_filter.model_dump(exclude_none=True).items())
+    return criteria
+
+
+def contact_values(patch: ContactPatch) -> dict:
+    """
+    Column values of given fields of patch, birth_md is added when birthday changed
+
+    :param patch: fields of contact to change
+    :return: values for UPDATE statement
+    :rtype: dict
+    """
+    values = patch.model_dump(exclude_unset=True)
+    if "birthday" in values:
+        values["birth_md"] = birthday_md(values["birthday"])
+    return values
+
+
+async def update_contacts(db: AsyncSession, patch: ContactPatch, user: User, ids: list[int] | None = None,
+                          contact_filter: ContactFilter | None = None) -> list[int]:
+    """
+    Update given fields of many contacts with one UPDATE ... RETURNING statement
+
+    :param db: connection to DB
+    :param patch: fields of contacts to change
+    :param user: owner of contacts
+    :param ids: ids of contacts to update *option
+    :param contact_filter: exact values of name, soname, email of contacts to update *option
+    :return: ids of updated contacts
+    :rtype: list[int]
+    """
+    stmt = update(Contact).where(*_batch_criteria(user, ids, contact_filter)).values(**contact_values(patch)) \
+        .returning(Contact.id)
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
+    updated = list(result.scalars().all())
+    await db.commit()
+    if updated:
+        await contacts_cache.bump(user.id)
+    return updated
+
+
+async def delete_contacts(db: AsyncSession, user: User, ids: list[int] | None = None,
+                          contact_filter: ContactFilter | None = None) -> list[int]:
+    """
+    Delete many contacts with one UPDATE ... RETURNING statement, deleted contacts are kept as tombstones
+
+    :param db: connection to DB
+    :param user: owner of contacts
+    :param ids: ids of contacts to delete *option
+    :param contact_filter: exact values of name, soname, email of contacts to delete *option
+    :return: ids of deleted contacts
+    :rtype: list[int]
+    """
+    stmt = update(Contact).where(*_batch_criteria(user, ids, contact_filter)).values(deleted_at=utcnow()) \
+        .returning(Contact.id)
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
+    deleted = list(result.scalars().all())
+    await db.commit()
+    if deleted:
+        await contacts_cache.bump(user.id)
+    return deleted
+
+
+async def update_contact_by_id(db: AsyncSession, contact_id: int, body: ContactModel, user: User) -> Contact | None:
     """
     Update information for existing contact
 
@@ -92,7 +313,7 @@ async def update_contact_by_id(db: Session, contact_id: int, body: ContactModel,
     :return: updated contact
     :rtype: Contact
     """
-    contact = db.query(Contact).filter_by(id=contact_id).first()
+    contact = await get_contact_by_id(db, contact_id, user)
     if contact:
         contact.name = body.name
         contact.soname = body.soname
@@ -100,12 +321,33 @@ async def update_contact_by_id(db: Session, contact_id: int, body: ContactModel,
         contact.email = body.email
         contact.birthday = body.birthday
         contact.info = body.info
-        contact.user_id = user.id
-        db.commit()
+        await db.commit()
+        await contacts_cache.bump(user.id)
     return contact
 
 
-async def create_contact(db: Session, body: ContactModel, user: User) -> Contact | None:
+async def patch_contact(db: AsyncSession, contact_id: int, patch: ContactPatch, user: User) -> Contact | None:
+    """
+    Update only given fields of contact with one UPDATE ... RETURNING statement (without reading contact before)
+
+    :param db: connection to DB
+    :param contact_id: id of contact
+    :param patch: fields of contact to change
+    :param user: owner of contacts
+    :return: updated contact or None if contact not found
+    :rtype: Contact | None
+    """
+    stmt = update(Contact).where(Contact.user_id == user.id, Contact.id == contact_id, Contact.deleted_at.is_(None)) \
+        .values(**contact_values(patch)).returning(Contact)
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
+    contact = result.scalar_one_or_none()
+    await db.commit()
+    if contact:
+        await contacts_cache.bump(user.id)
+    return contact
+
+
+async def create_contact(db: AsyncSession, body: ContactModel, user: User) -> Contact | None:
     """
     Create new contact
 
@@ -118,28 +360,60 @@ async def create_contact(db: Session, body: ContactModel, user: User) -> Contact
     contact = Contact(name=body.name, soname=body.soname, email=body.email, phone=body.phone, info=body.info,
                       birthday=body.birthday, user_id=user.id)
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
+    await db.refresh(contact)
+    await contacts_cache.bump(user.id)
     return contact
 
 
-async def get_upcoming_birthdays(db: Session, user: User) -> list[Type[Contact]] | None:
+async def create_contacts(db: AsyncSession, bodies: list[ContactModel], user: User) -> int:
+    """
+    Create many contacts with one batched INSERT and one commit
+
+    :param db: connection to DB
+    :param bodies: list of contact information
+    :param user: owner of contacts
+    :return: number of created contacts
+    :rtype: int
+    """
+    rows = [{**body.model_dump(), "birth_md": birthday_md(body.birthday), "user_id": user.id} for body in bodies]
+    await db.execute(insert(Contact), rows)
+    await db.commit()
+    await contacts_cache.bump(user.id)
+    return len(rows)
+
+
+def upcoming_birthday_mds(today: datetime.date, days: int = 7) -> list[int]:
+    """
+    Month-day numbers of birthdays which fall into window from today till today + days (inclusive)
+
+    Birthdays on 29 February are celebrated on 1 March in non-leap years.
+
+    :param today: first day of window
+    :param days: length of window in days
+    :return: month-day numbers in order of appearance in window
+    :rtype: list[int]
+    """
+    mds = []
+    for shift in range(days + 1):
+        day = today + datetime.timedelta(days=shift)
+        mds.append(birthday_md(day))
+        if day.month == 3 and day.day == 1 and not calendar.isleap(day.year):
+            mds.append(birthday_md(datetime.date(2000, 2, 29)))
+    return mds
+
+
+async def get_upcoming_birthdays(db: AsyncSession, user: User) -> list[Type[Contact]] | None:
     """
     Get list of contacts with birthday in nearest 7 day
 
     :param db: connection to DB
     :param user: owner of contacts
-    :return: List of users with birthday in nearest week
+    :return: List of users with birthday in nearest week, nearest first
     :rtype: List[Contact]
     """
-    nearest_birthdays = []
-    today = datetime.date.today()
-    contacts = db.query(Contact).filter(user_id=user.id).all()
-    for contact in contacts:
-        birthday = contact.birthday
-        birthday_date_in_year = datetime.date.replace(birthday, year=today.year)
-        if 0 > (birthday_date_in_year - today).days:
-            birthday_date_in_year = datetime.date.replace(birthday, year=today.year + 1)
-        if (birthday_date_in_year - today).days <= 7:
-            nearest_birthdays.append(contact)
-    return nearest_birthdays
+    mds = upcoming_birthday_mds(datetime.date.today())
+    stmt = select(Contact).where(Contact.user_id == user.id, Contact.deleted_at.is_(None), Contact.birth_md.in_(mds))
+    result = await db.execute(stmt)
+    order = {md: i for i, md in enumerate(mds)}
+    return sorted(result.scalars(), key=lambda contact: order[contact.birth_md])
@@ -1,12 +1,14 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas import UserModel
+from src.services.cache import user_cache
 
 """ Access for users"""
 
 
-async def create_user(db: Session, body: UserModel) -> User:
+async def create_user(db: AsyncSession, body: UserModel) -> User:
     """
     Create new user
 
@@ -17,12 +19,12 @@ async def create_user(db: Session, body: UserModel) -> User:
     """
     user = User(**body.__dict__)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
-async def get_user_by_email(db: Session, email: str) -> User | None:
+async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     """
     Get user by email
 
@@ -31,10 +33,11 @@ async def get_user_by_email(db: Session, email: str) -> User | None:
     :return: user
     :rtype: User
     """
-    return db.query(User).filter_by(email=email).first()
+    result = await db.execute(select(User).filter_by(email=email))
+    return result.scalar_one_or_none()
 
 
-async def update_token(db: Session, user: User, token: str | None) -> None:
+async def update_token(db: AsyncSession, user: User, token: str | None) -> None:
     """
 
     :param db: connection to DB
@@ -44,10 +47,25 @@ async def update_token(db: Session, user: User, token: str | None) -> None:
     :rtype: None
     """
     user.update_token = token
-    db.commit()
+    await db.commit()
+    await user_cache.delete(user.email)
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_password(db: AsyncSession, user: User, password: str) -> None:
+    """
+    Replace stored password hash (e.g. by hash with higher cost factor)
+
+    :param db: connection to DB
+    :param user: application user
+    :param password: new password hash
+    :return: Nothing return
+    :rtype: None
+    """
+    user.password = password
+    await db.commit()
+
+
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     Update user avatar using user email for user identification
 
@@ -59,11 +77,12 @@ async def update_avatar(email, url: str, db: Session) -> User:
     """
     user = await get_user_by_email(db, email)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    await user_cache.delete(email)
     return user
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     Confirm user email
 
@@ -75,4 +94,5 @@ async def confirmed_email(email: str, db: Session) -> None:
 
     user = await get_user_by_email(db, email)
     user.email_confirmed = True
-    db.commit()
+    await db.commit()
+    await user_cache.delete(email)
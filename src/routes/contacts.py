@@ -1,50 +1,214 @@
-from fastapi import APIRouter, Depends, status
-from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
 
-from src.database.db import get_db
+from fastapi import APIRouter, Depends, status, Query, HTTPException, UploadFile, File, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.Settings import settings
+from src.database.db import get_db, get_session_factory
 from src.database.models import User
 from src.repository import contacts as repository_contacts
-from src.schemas import ContactResponse, ContactModel
+from src.schemas import ContactResponse, ContactModel, ContactPatch, ContactPage, ContactImportResult, ContactBatchSelect, \
+    ContactBatchUpdate, ContactBatchResult, ContactChanges
 from src.services.auth import auth_service
+from src.services import contacts_io
+from src.services.cache import contacts_cache
+from src.services.rate_limit import RateLimit
+from src.services.serialization import contact_rows_json
 
 router = APIRouter(prefix="/contacts")
 
+CONTACT = TypeAdapter(ContactResponse)
+CONTACT_LIST = TypeAdapter(list[ContactResponse])
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _validated(load: Callable[..., Awaitable], adapter: TypeAdapter) -> Callable[[], Awaitable[bytes]]:
+    async def render() -> bytes:
+        return adapter.dump_json(adapter.validate_python(await load(), from_attributes=True))
+    return render
+
+
+def _contact_list(load: Callable[..., Awaitable]) -> Callable[[], Awaitable[bytes]]:
+    # load(rows=True) returns row tuples which are dumped without output validation
+    if settings.fast_serialization:
+        async def render() -> bytes:
+            return contact_rows_json(await load(rows=True))
+        return render
+    return _validated(load, CONTACT_LIST)
+
+
+async def _conditional_response(request: Request, user: User, render: Callable[[], Awaitable[bytes]]) -> Response:
+    """
+    Response with ETag based on version of user contacts
+
+    Returns 304 Not Modified if client has actual version, body from Redis response cache if present,
+    otherwise loads data from DB by render. Without Redis data is always loaded and ETag is not sent.
+    """
+    version = await contacts_cache.version(user.id)
+    if version is None:
+        return Response(await render(), media_type="application/json")
+    etag = contacts_cache.etag(user.id, version, f"{request.url.path}?{request.url.query}")
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    body = await contacts_cache.get_response(etag)
+    if body is None:
+        body = await render()
+        await contacts_cache.set_response(etag, body)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
 
-@router.get("/", response_model=list[ContactResponse], dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-async def read_contacts(name: str = None, soname: str = None, email: str = None, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@router.get("/", response_model=list[ContactResponse], dependencies=[Depends(RateLimit("contacts:list", times=2, seconds=5))])
+async def read_contacts(request: Request, name: str = None, soname: str = None, email: str = None,
+                        skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                        current_user: User = Depends(auth_service.get_current_user),
+                        db: AsyncSession = Depends(get_db)):
     """
-    API route get contacts for login user
+    API route get contacts for login user, supports conditional requests by ETag
 
+    :param request: request from client
     :param name: contact name *option
     :param soname: contact soname *option
     :param email: contact email *option
+    :param skip: offset for first contact in result
+    :param limit: how many records should result limited
     :param current_user: owner of contacts
     :param db: session for DB connection
     :return: List of contacts
     """
-    if name or soname or email:
-        res = await repository_contacts.get_contact_(db, name=name, soname=soname, email=email, user=current_user)
-    else:
-        res = await repository_contacts.get_all_contacts(db, current_user)
-    return res
+    async def load(rows: bool = False):
+        if name or soname or email:
+            return await repository_contacts.get_contact_(db, name=name, soname=soname, email=email,
+                                                          user=current_user, rows=rows)
+        return await repository_contacts.get_all_contacts(db, current_user, skip=skip, limit=limit, rows=rows)
+
+    return await _conditional_response(request, current_user, _contact_list(load))
+
+
+@router.get("/page", response_model=ContactPage, dependencies=[Depends(RateLimit("contacts:page", times=2, seconds=5))])
+async def read_contacts_page(cursor: str = None, limit: int = Query(100, ge=1, le=1000),
+                             current_user: User = Depends(auth_service.get_current_user),
+                             db: AsyncSession = Depends(get_db)):
+    """
+    API route get contacts for login user page by page
+
+    :param cursor: next_cursor from previous page *option
+    :param limit: max contacts on page
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: contacts on page and cursor for next page
+    """
+    try:
+        items, next_cursor = await repository_contacts.get_contacts_page(db, current_user, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@router.get("/changes", response_model=ContactChanges, dependencies=[Depends(RateLimit("contacts:changes", times=2, seconds=5))])
+async def read_changes(since: datetime = None, after_id: int = Query(0, ge=0),
+                       limit: int = Query(500, ge=1, le=1000),
+                       current_user: User = Depends(auth_service.get_current_user),
+                       db: AsyncSession = Depends(get_db)):
+    """
+    API route for sync of contacts, returns contacts changed or deleted after given change
+
+    First sync is started without since, next syncs use next_since and next_after_id from previous response.
+    updated_at is stamped by app when change is flushed, change may be committed later, so next_since never
+    passes sync_overlap seconds before now. Changes of that window are returned again by next sync, clients
+    must apply changes by contact id (the same change may come twice).
+
+    :param since: updated_at of last known change (UTC if timezone not given) *option
+    :param after_id: id of last known change *option
+    :param limit: max number of changes in response
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: changed contacts, deleted contacts have only id, updated_at and deleted flag
+    """
+    horizon = datetime.now(timezone.utc) - timedelta(seconds=settings.sync_overlap)
+    start = datetime.fromtimestamp(0, timezone.utc) if since is None else _as_utc(since)
+    contacts = await repository_contacts.get_changes(db, current_user, start, after_id=after_id, limit=limit)
+    changes = [{"id": contact.id, "updated_at": contact.updated_at, "deleted": contact.deleted_at is not None,
+                "contact": None if contact.deleted_at is not None else contact} for contact in contacts]
+    next_since, next_after_id = (_as_utc(contacts[-1].updated_at), contacts[-1].id) if contacts else (since, after_id)
+    has_more = len(contacts) == limit
+    if next_since is not None and _as_utc(next_since) > horizon:
+        # changes committed late may still appear before now - sync_overlap, next sync reads them again
+        next_since, next_after_id, has_more = horizon, 0, False
+    return {"changes": changes, "next_since": next_since, "next_after_id": next_after_id, "has_more": has_more}
+
+
+@router.get("/search", response_model=list[ContactResponse], dependencies=[Depends(RateLimit("contacts:search", times=2, seconds=5))])
+async def search_contacts(q: str = Query(min_length=1, max_length=100), limit: int = Query(20, ge=1, le=100),
+                          current_user: User = Depends(auth_service.get_current_user),
+                          db: AsyncSession = Depends(get_db)):
+    """
+    API route for fuzzy search of contacts by name, soname, email, phone and info
+
+    :param q: text to search
+    :param limit: max contacts in result
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: List of contacts, best matches first
+    """
+    async def load(rows: bool = False):
+        return await repository_contacts.search_contacts(db, q, current_user, limit=limit, rows=rows)
+
+    return Response(await _contact_list(load)(), media_type="application/json")
+
+
+@router.get("/export", response_class=StreamingResponse, dependencies=[Depends(RateLimit("contacts:export", times=1, seconds=10))])
+async def export_contacts(fmt: str = Query("csv", pattern="^(csv|ndjson|vcf)$"),
+                          current_user: User = Depends(auth_service.get_current_user),
+                          session_factory: async_sessionmaker = Depends(get_session_factory)):
+    """
+    API route for export of all contacts as CSV, NDJSON or vCard file, file is streamed while read from DB
+
+    :param fmt: format of file
+    :param current_user: owner of contacts
+    :param session_factory: factory of sessions for DB connection
+    :return: file with contacts
+    """
+    return StreamingResponse(contacts_io.export_contacts(session_factory, current_user, fmt),
+                             media_type=contacts_io.EXPORT_MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="contacts.{fmt}"'})
 
 
-@router.get("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-async def read_by_id(contact_id: int, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@router.get("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimit("contacts:read", times=2, seconds=5))])
+async def read_by_id(request: Request, contact_id: int, current_user: User = Depends(auth_service.get_current_user),
+                     db: AsyncSession = Depends(get_db)):
     """
-    API route to get contact details by contact ID
+    API route to get contact details by contact ID, supports conditional requests by ETag
 
+    :param request: request from client
     :param contact_id: ID of contact
     :param current_user: owner of contacts
     :param db: session for DB connection
     :return: contact information
     """
-    return await repository_contacts.get_contact_by_id(db, contact_id, current_user)
+    async def load():
+        contact = await repository_contacts.get_contact_by_id(db, contact_id, current_user)
+        if contact is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        return contact
+
+    return await _conditional_response(request, current_user, _validated(load, CONTACT))
 
 
-@router.delete("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-async def remove_contact(contact_id: int, current_user: User = Depends(auth_service.get_current_user), db=Depends(get_db)):
+@router.delete("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimit("contacts:delete", times=2, seconds=5))])
+async def remove_contact(contact_id: int, current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     """
     API route for delete contact using contact ID
 
@@ -56,8 +220,8 @@ async def remove_contact(contact_id: int, current_user: User = Depends(auth_serv
     return await repository_contacts.delete_contact(db, contact_id, current_user)
 
 
-@router.put("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-async def update_by_id(contact_id: int, body: ContactModel, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@router.put("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimit("contacts:update", times=2, seconds=5))])
+async def update_by_id(contact_id: int, body: ContactModel, current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     """
     API route for update contact using contact ID
 
@@ -70,8 +234,28 @@ async def update_by_id(contact_id: int, body: ContactModel, current_user: User =
     return await repository_contacts.update_contact_by_id(db, contact_id, body, current_user)
 
 
-@router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-async def create_contact(body: ContactModel, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@router.patch("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(RateLimit("contacts:patch", times=2, seconds=5))])
+async def patch_by_id(contact_id: int, body: ContactPatch, current_user: User = Depends(auth_service.get_current_user),
+                      db: AsyncSession = Depends(get_db)):
+    """
+    API route for update of given fields of contact using contact ID
+
+    :param contact_id: ID of contact
+    :param body: fields to be updated
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: updated contact information
+    """
+    if not body.model_fields_set:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    contact = await repository_contacts.patch_contact(db, contact_id, body, current_user)
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    return contact
+
+
+@router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(RateLimit("contacts:create", times=2, seconds=5))])
+async def create_contact(body: ContactModel, current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     """
     API route for create new contact
     :param body: information of new contact
@@ -82,8 +266,69 @@ async def create_contact(body: ContactModel, current_user: User = Depends(auth_s
     return await repository_contacts.create_contact(db, body, current_user)
 
 
+@router.post("/import", response_model=ContactImportResult, dependencies=[Depends(RateLimit("contacts:import", times=1, seconds=10))])
+async def import_contacts(file: UploadFile = File(), fmt: str = Query(None, pattern="^(csv|ndjson)$"),
+                          current_user: User = Depends(auth_service.get_current_user),
+                          db: AsyncSession = Depends(get_db)):
+    """
+    API route for bulk import of contacts from CSV (with header) or NDJSON file
+
+    :param file: file with contacts, columns/keys are the same as fields of contact
+    :param fmt: format of file, detected by file extension if not given
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: number of imported and failed rows with errors of failed rows
+    """
+    if fmt is None:
+        fmt = "ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+    return await contacts_io.import_contacts(db, file.file, fmt, current_user)
+
+
+def _batch_results(requested: list[int] | None, changed: list[int], status_: str) -> list[dict]:
+    if requested is None:
+        return [{"id": contact_id, "status": status_} for contact_id in sorted(changed)]
+    changed = set(changed)
+    return [{"id": contact_id, "status": status_ if contact_id in changed else "not_found"}
+            for contact_id in dict.fromkeys(requested)]
+
+
+@router.post("/batch_update", response_model=list[ContactBatchResult],
+             dependencies=[Depends(RateLimit("contacts:batch_update", times=2, seconds=5))])
+async def batch_update(body: ContactBatchUpdate, current_user: User = Depends(auth_service.get_current_user),
+                       db: AsyncSession = Depends(get_db)):
+    """
+    API route for update of given fields of many contacts in one transaction
+
+    :param body: ids or filter of contacts and fields to change
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: status of every contact
+    """
+    if not body.patch.model_fields_set:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    updated = await repository_contacts.update_contacts(db, body.patch, current_user, ids=body.ids,
+                                                        contact_filter=body.filter)
+    return _batch_results(body.ids, updated, "updated")
+
+
+@router.post("/batch_delete", response_model=list[ContactBatchResult],
+             dependencies=[Depends(RateLimit("contacts:batch_delete", times=2, seconds=5))])
+async def batch_delete(body: ContactBatchSelect, current_user: User = Depends(auth_service.get_current_user),
+                       db: AsyncSession = Depends(get_db)):
+    """
+    API route for delete of many contacts in one transaction
+
+    :param body: ids or filter of contacts
+    :param current_user: owner of contacts
+    :param db: session for DB connection
+    :return: status of every contact
+    """
+    deleted = await repository_contacts.delete_contacts(db, current_user, ids=body.ids, contact_filter=body.filter)
+    return _batch_results(body.ids, deleted, "deleted")
+
+
 @router.get("/upcoming_birthdays/", response_model=list[ContactResponse])
-async def upcoming_birthdays(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def upcoming_birthdays(current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     """
     API route to get nearest contacts birthdays
 
@@ -0,0 +1,112 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Security, status
+from fastapi.security import APIKeyHeader
+
+from src.Settings import settings
+from src.database.db import engine, pool_stats, replica_set
+from src.services.auth import auth_service
+from src.services.avatars import avatar_service
+from src.services.cache import user_cache
+from src.services.email import mail_queue
+from src.services.rate_limit import rate_limiter
+
+service_token_header = APIKeyHeader(name="X-Service-Token", auto_error=False)
+
+
+async def verify_service_token(token: str | None = Security(service_token_header)) -> None:
+    """
+    Service routes are internal, they are served only for requests with X-Service-Token header equal to
+    service_token setting and are disabled when setting is empty
+
+    :param token: value of X-Service-Token header
+    :return: Nothing return
+    :rtype: None
+    """
+    if not settings.service_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if token is None or not secrets.compare_digest(token.encode(), settings.service_token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid service token")
+
+
+router = APIRouter(prefix="/service", tags=["service"], dependencies=[Depends(verify_service_token)])
+
+
+@router.get("/db_pool")
+async def db_pool():
+    """
+    API route with state of DB connection pool of current worker
+
+    :return: checked out, idle and overflow connections, checkouts count and wait times
+    """
+    return pool_stats(engine)
+
+
+@router.get("/db_replicas")
+async def db_replicas():
+    """
+    API route with health and usage of read replicas
+
+    :return: replicas with health, reads and pool state, number of reads sent to primary
+    """
+    return {"replicas": replica_set.stats(), "primary_reads": replica_set.primary_reads}
+
+
+@router.get("/user_cache")
+async def user_cache_stats():
+    """
+    API route with statistic of in-process user cache of current worker
+
+    :return: size, hits, misses and hit ratio of cache
+    """
+    return user_cache.local.stats()
+
+
+@router.get("/token_cache")
+async def token_cache_stats():
+    """
+    API route with statistic of verified JWT tokens cache of current worker
+
+    :return: size, hits, misses and hit ratio of cache
+    """
+    return auth_service.token_cache.stats()
+
+
+@router.get("/password_hasher")
+async def password_hasher_stats():
+    """
+    API route with state of password hashing pool of current worker
+
+    :return: workers, active and queued calls, completed and rejected counters
+    """
+    return auth_service.password_hasher.stats()
+
+
+@router.get("/mail_queue")
+async def mail_queue_stats():
+    """
+    API route with state of outbound email queue
+
+    :return: number of queued, processing, waiting for retry and dead emails
+    """
+    return await mail_queue.stats()
+
+
+@router.get("/avatars")
+async def avatars_stats():
+    """
+    API route with counters of avatar uploads of current worker
+
+    :return: number of uploaded and skipped (not changed) avatars
+    """
+    return {"uploads": avatar_service.uploads, "skipped": avatar_service.skipped}
+
+
+@router.get("/rate_limiter")
+async def rate_limiter_stats():
+    """
+    API route with counters of rate limiter of current worker
+
+    :return: allowed and rejected requests, calls to Redis, locally used tokens and Redis errors
+    """
+    return rate_limiter.stats()
@@ -1,13 +1,11 @@
-import cloudinary
-import cloudinary.uploader
 from fastapi import APIRouter, UploadFile, File, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.Settings import settings
 from src.database.db import get_db
 from src.database.models import User
 from src.schemas import UserDb
 from src.services.auth import auth_service
+from src.services.avatars import avatar_service
 import src.repository.users as repository_users
 
 router = APIRouter(prefix="/users")
@@ -15,24 +13,18 @@ router = APIRouter(prefix="/users")
 
 @router.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db)):
     """
-    API route to update user avatar
+    API route to update user avatar, image is resized to square avatar before upload to storage
 
     :param file: avatar image
     :param current_user: owner of contacts
     :param db: session for DB connection
     :return: updated user
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.name}', overwrite=True)
-    src_url = cloudinary.CloudinaryResource(f'NotesApp/{current_user.name}') \
-        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
+    url = await avatar_service.upload(current_user, file)
+    if url == current_user.avatar:
+        # current user may come from cache without password, response is built from user in DB
+        return await repository_users.get_user_by_email(db, current_user.email)
+    user = await repository_users.update_avatar(current_user.email, url, db)
     return user
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field, EmailStr, PastDate
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field, EmailStr, PastDate, field_validator, model_validator
 
 """
 """
@@ -18,6 +21,79 @@ class ContactResponse(ContactModel):
         from_attributes = True
 
 
+class ContactPatch(BaseModel):
+    name: str | None = Field(None, max_length=50)
+    soname: str | None = Field(None, max_length=50)
+    email: EmailStr | None = Field(None, max_length=100)
+    phone: str | None = None
+    birthday: PastDate | None = None
+    info: str | None = Field(None, max_length=255)
+
+    @field_validator("*")
+    @classmethod
+    def check_not_null(cls, value):
+        # field may be omitted, but can not be set to null, responses require every field of contact
+        if value is None:
+            raise ValueError("field can not be null")
+        return value
+
+
+class ContactFilter(BaseModel):
+    name: str | None = None
+    soname: str | None = None
+    email: str | None = None
+
+
+class ContactBatchSelect(BaseModel):
+    ids: list[int] | None = Field(None, min_length=1, max_length=1000)
+    filter: ContactFilter | None = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if self.ids is None and (self.filter is None or not self.filter.model_dump(exclude_none=True)):
+            raise ValueError("ids or filter should be given")
+        return self
+
+
+class ContactBatchUpdate(ContactBatchSelect):
+    patch: ContactPatch
+
+
+class ContactBatchResult(BaseModel):
+    id: int
+    status: Literal["updated", "deleted", "not_found"]
+
+
+class ContactPage(BaseModel):
+    items: list[ContactResponse]
+    next_cursor: str | None = None
+
+
+class ContactImportError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class ContactImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: list[ContactImportError]
+
+
+class ContactChange(BaseModel):
+    id: int
+    updated_at: datetime
+    deleted: bool
+    contact: ContactResponse | None = None
+
+
+class ContactChanges(BaseModel):
+    changes: list[ContactChange]
+    next_since: datetime | None
+    next_after_id: int
+    has_more: bool
+
+
 class UserModel(BaseModel):
     name: str = Field(max_length=50)
     email: str = Field(EmailStr)
@@ -1,30 +1,43 @@
-import pickle
-from redis import Redis
+import hashlib
+import time
 from typing import Optional
-from jose import JWTError, jwt
+from jose import JWTError
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.Settings import settings
-from src.database.db import get_db
+from src.database.db import get_db, use_replica
 from src.repository import users as repository_users
+from src.services.cache import user_cache, LocalCache
+from src.services.jwt_backend import create_jwt_backend
+from src.services.metrics import timer
+from src.services.passwords import PasswordHasher
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    redis = Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    user_cache = user_cache
 
-    def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    def __init__(self):
+        self.jwt_backend = create_jwt_backend(settings.jwt_backend, self.SECRET_KEY, self.ALGORITHM)
+        self.token_cache = LocalCache(maxsize=settings.jwt_cache_size)
+        self.password_hasher = PasswordHasher(rounds=settings.bcrypt_rounds, workers=settings.password_hash_workers,
+                                              max_queue=settings.password_hash_queue,
+                                              executor=settings.password_hash_executor)
 
-    def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+    async def verify_password(self, plain_password, hashed_password):
+        verified, _ = await self.password_hasher.verify_and_update(plain_password, hashed_password)
+        return verified
+
+    async def verify_and_update_password(self, plain_password, hashed_password):
+        return await self.password_hasher.verify_and_update(plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str):
+        return await self.password_hasher.hash(password)
 
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
         to_encode = data.copy()
@@ -33,7 +46,7 @@ class Auth:
         else:
             expire = datetime.now() + timedelta(minutes=15)
         to_encode.update({"iat": datetime.now(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_access_token = self.jwt_backend.encode(to_encode)
         return encoded_access_token
 
     async def create_refresh_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -43,12 +56,12 @@ class Auth:
         else:
             expire = datetime.now() + timedelta(days=7)
         to_encode.update({"iat": datetime.now(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_refresh_token = self.jwt_backend.encode(to_encode)
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.jwt_backend.decode(refresh_token)
             if payload['scope'] == 'refresh_token':
                 email = payload['sub']
                 return email
@@ -56,7 +69,25 @@ class Auth:
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    def decode_access_token(self, token: str) -> dict:
+        """
+        Decode token, verified payload is cached by token digest until token expires
+
+        :param token: JWT token
+        :return: token payload
+        :rtype: dict
+        :raises JWTError: if token is invalid or expired
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is None:
+            payload = self.jwt_backend.decode(token)
+            ttl = payload.get("exp", 0) - time.time()
+            if ttl > 0:
+                self.token_cache.set(key, payload, ttl=ttl)
+        return payload
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -65,7 +96,8 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            with timer("jwt"):
+                payload = self.decode_access_token(token)
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -74,28 +106,25 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        data = self.redis.get(f"user:{email}")
-        user = None
-        if data:
-            user = pickle.loads(data)
+        user = await self.user_cache.get(email)
         if user is None:
             user = await repository_users.get_user_by_email(db, email)
-            self.redis.set(f"user:{email}", pickle.dumps(user))
-            self.redis.expire(f"user:{email}", 900)
-        if user is None:
-            raise credentials_exception
+            if user is None:
+                raise credentials_exception
+            await self.user_cache.set(user)
+        await use_replica(db, user.id)
         return user
 
     def create_email_token(self, data: dict):
         to_encode = data.copy()
         expire = datetime.now() + timedelta(days=7)
         to_encode.update({"iat": datetime.now(), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = self.jwt_backend.encode(to_encode)
         return token
 
     async def get_email_from_token(self, token: str):
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.jwt_backend.decode(token)
             email = payload["sub"]
             return email
         except JWTError as e:
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.Settings import settings
+from src.database.models import User
+
+"""
+Avatar upload pipeline: limited read of upload, resize in thread pool and upload to storage
+"""
+
+CHUNK_SIZE = 64 * 1024
+
+# decoding of huge images is refused by Pillow before pixels are allocated
+Image.MAX_IMAGE_PIXELS = 25_000_000
+
+
+def resize_avatar(data: bytes, size: int = 250) -> bytes:
+    """
+    Crop image to square in center and scale it to size x size JPEG
+
+    :param data: uploaded image
+    :param size: width and height of avatar
+    :return: JPEG image
+    :rtype: bytes
+    :raises ValueError: data is not an image
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (size, size))
+            avatar = ImageOps.fit(ImageOps.exif_transpose(image).convert("RGB"), (size, size))
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        raise ValueError(str(err)) from err
+    buffer = io.BytesIO()
+    avatar.save(buffer, "JPEG", quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+class CloudinaryStorage:
+    """
+    Avatars in Cloudinary, client is configured once
+
+    :param folder: folder of avatars in Cloudinary
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = "NotesApp"):
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.folder = folder
+
+    def save(self, key: str, data: bytes) -> str:
+        """
+        :param key: name of avatar
+        :param data: JPEG image
+        :return: URL of avatar
+        :rtype: str
+        """
+        result = cloudinary.uploader.upload(io.BytesIO(data), public_id=f"{self.folder}/{key}", overwrite=True)
+        return result["secure_url"]
+
+
+class LocalStorage:
+    """
+    Avatars in local folder served by static files server
+
+    :param root: folder of avatars
+    :param base_url: URL of folder
+    """
+
+    def __init__(self, root: str | Path, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, key: str, data: bytes) -> str:
+        """
+        :param key: name of avatar
+        :param data: JPEG image
+        :return: URL of avatar
+        :rtype: str
+        """
+        path = self.root / f"{key}.jpg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return f"{self.base_url}/{key}.jpg"
+
+
+AVATAR_STORAGES = {
+    "cloudinary": lambda: CloudinaryStorage(settings.cloudinary_name, settings.cloudinary_api_key,
+                                            settings.cloudinary_api_secret),
+    "local": lambda: LocalStorage(settings.avatar_local_dir, settings.avatar_base_url),
+}
+
+
+class AvatarService:
+    """
+    Upload of user avatars, CPU work and blocking storage calls are run in thread pool
+
+    Name of avatar contains hash of uploaded file, same file uploaded again is not processed.
+
+    :param storage: storage with save(key, data) method returning URL
+    :param max_bytes: max size of uploaded file, bigger files rejected with 413 error
+    :param size: width and height of avatar
+    :param workers: number of threads in pool
+    """
+
+    def __init__(self, storage, max_bytes: int = 5 * 1024 * 1024, size: int = 250, workers: int = 2):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar")
+        self.uploads = 0
+        self.skipped = 0
+
+    async def read(self, file: UploadFile) -> bytes:
+        """
+        :param file: uploaded file
+        :return: content of file
+        :rtype: bytes
+        """
+        if file.size is not None and file.size > self.max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Avatar is bigger than {self.max_bytes} bytes")
+        data = bytearray()
+        while chunk := await file.read(CHUNK_SIZE):
+            data += chunk
+            if len(data) > self.max_bytes:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                    detail=f"Avatar is bigger than {self.max_bytes} bytes")
+        return bytes(data)
+
+    async def upload(self, user: User, file: UploadFile) -> str:
+        """
+        Resize uploaded image and save it to storage
+
+        :param user: owner of avatar
+        :param file: uploaded image
+        :return: URL of avatar, current avatar of user if image is not changed
+        :rtype: str
+        """
+        data = await self.read(file)
+        key = f"{user.id}/{hashlib.sha256(data).hexdigest()[:32]}-{self.size}"
+        if user.avatar and key in user.avatar:
+            self.skipped += 1
+            return user.avatar
+        loop = asyncio.get_running_loop()
+        try:
+            avatar = await loop.run_in_executor(self.executor, resize_avatar, data, self.size)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="File is not an image")
+        url = await loop.run_in_executor(self.executor, self.storage.save, key, avatar)
+        self.uploads += 1
+        return url
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+avatar_service = AvatarService(AVATAR_STORAGES[settings.avatar_storage](), max_bytes=settings.avatar_max_bytes,
+                               size=settings.avatar_size, workers=settings.avatar_workers)
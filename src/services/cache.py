@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.Settings import settings
+from src.database.models import User
+from src.services.redis_client import redis_client
+
+"""
+Cache of authenticated users
+"""
+
+
+class LocalCache:
+    """
+    In-process LRU cache with TTL of every item
+
+    :param maxsize: max number of items, least recently used item removed first
+    :param ttl: seconds item is valid after set
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key: str):
+        """
+        :param key: item key
+        :return: item value or None if item absent or expired
+        """
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        """
+        :param key: item key
+        :param value: item value
+        :param ttl: seconds item is valid, default ttl of cache if not given
+        """
+        self._items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: size of cache with hit and miss counters
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class UserCache:
+    """
+    Two level cache with compact JSON projection of User (without password and tokens)
+
+    Level 1 is LocalCache of worker, level 2 is Redis shared by all workers. Change of user removes it from
+    Redis and notifies all workers through Redis pub/sub channel to remove user from their LocalCache.
+
+    Key contains VERSION, so change of cached fields only requires to increase VERSION.
+    Redis errors are not raised, cache just behaves like empty.
+    """
+    VERSION = 1
+    FIELDS = ("id", "name", "email", "avatar", "email_confirmed")
+    CHANNEL = f"user:v{VERSION}:invalidate"
+
+    def __init__(self, redis: Redis, ttl: int = 900, local: LocalCache | None = None):
+        self.redis = redis
+        self.ttl = ttl
+        self.local = local or LocalCache()
+
+    def key(self, email: str) -> str:
+        """
+        :param email: user email
+        :return: Redis key for user
+        :rtype: str
+        """
+        return f"user:v{self.VERSION}:{email}"
+
+    @classmethod
+    def dumps(cls, user: User) -> bytes:
+        return json.dumps({field: getattr(user, field) for field in cls.FIELDS}, separators=(",", ":")).encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> User:
+        return User(password=None, **json.loads(data))
+
+    async def get(self, email: str) -> User | None:
+        """
+        Get user from cache
+
+        :param email: user email
+        :return: detached User with cached fields or None if user not in cache
+        :rtype: User | None
+        """
+        key = self.key(email)
+        data = self.local.get(key)
+        if data is None:
+            try:
+                data = await self.redis.get(key)
+            except RedisError:
+                return None
+            if data is None:
+                return None
+            self.local.set(key, data)
+        return self.loads(data)
+
+    async def set(self, user: User) -> None:
+        """
+        Put user to cache for ttl seconds
+
+        :param user: user to cache
+        :return: Nothing return
+        :rtype: None
+        """
+        key, data = self.key(user.email), self.dumps(user)
+        self.local.set(key, data)
+        try:
+            await self.redis.set(key, data, ex=self.ttl)
+        except RedisError:
+            pass
+
+    async def delete(self, email: str) -> None:
+        """
+        Remove user from cache of all workers
+
+        :param email: user email
+        :return: Nothing return
+        :rtype: None
+        """
+        self.local.delete(self.key(email))
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(self.key(email))
+                pipe.publish(self.CHANNEL, email)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    async def listen_invalidations(self) -> None:
+        """
+        Remove from LocalCache users changed by other workers, run as background task of worker
+
+        LocalCache is cleared when connection to Redis lost, because notifications could be missed.
+
+        :return: Nothing return
+        :rtype: None
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            email = message["data"]
+                            self.local.delete(self.key(email.decode() if isinstance(email, bytes) else email))
+            except RedisError:
+                self.local.clear()
+                await asyncio.sleep(1)
+
+
+class ContactsCache:
+    """
+    Version of contacts of every user and cache of contacts responses in Redis
+
+    Version is changed by every change of user contacts, so ETag and cached responses of previous version
+    are not used anymore. Version is started from current time, so lost version key never repeats old version.
+    Version key expires after version_ttl seconds, so version which was not changed because of Redis error
+    is not used for long. Redis errors are not raised, version is None when Redis is unavailable.
+
+    :param redis: Redis client
+    :param ttl: seconds to keep cached responses, responses are not cached if 0
+    :param version_ttl: seconds to keep version of user contacts
+    """
+
+    def __init__(self, redis: Redis, ttl: int = 60, version_ttl: int = 300):
+        self.redis = redis
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        # users whose version could not be changed, responses of this worker are not cached until version expires
+        self._unversioned: dict[int, float] = {}
+
+    @staticmethod
+    def version_key(user_id: int) -> str:
+        return f"contacts:version:{user_id}"
+
+    async def version(self, user_id: int) -> int | None:
+        """
+        :param user_id: owner of contacts
+        :return: current version of user contacts or None if Redis is unavailable or version is stale
+        :rtype: int | None
+        """
+        until = self._unversioned.get(user_id)
+        if until is not None:
+            if until > time.monotonic():
+                return None
+            del self._unversioned[user_id]
+        try:
+            version = await self.redis.get(self.version_key(user_id))
+            if version is None:
+                await self.redis.set(self.version_key(user_id), time.time_ns(), nx=True, ex=self.version_ttl)
+                version = await self.redis.get(self.version_key(user_id))
+        except RedisError:
+            return None
+        return None if version is None else int(version)
+
+    async def bump(self, user_id: int) -> None:
+        """
+        Change version of user contacts after contacts changed
+
+        If version can not be changed, version key is removed. If Redis fails again, this worker does not use
+        version of user until old version expires.
+
+        :param user_id: owner of contacts
+        :return: Nothing return
+        :rtype: None
+        """
+        key = self.version_key(user_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, self.version_ttl)
+                version, _ = await pipe.execute()
+            if not version > 1:
+                # key was lost, start again from current time
+                await self.redis.set(key, time.time_ns(), ex=self.version_ttl)
+            return
+        except RedisError:
+            pass
+        try:
+            await self.redis.delete(key)
+        except RedisError:
+            self._unversioned[user_id] = time.monotonic() + self.version_ttl
+
+    @staticmethod
+    def etag(user_id: int, version: int, resource: str) -> str:
+        """
+        :param user_id: owner of contacts
+        :param version: version of user contacts
+        :param resource: path and query of request
+        :return: weak ETag of response
+        :rtype: str
+        """
+        digest = hashlib.sha1(resource.encode()).hexdigest()[:16]
+        return f'W/"{user_id}-{version}-{digest}"'
+
+    async def get_response(self, etag: str) -> bytes | None:
+        """
+        :param etag: ETag of response
+        :return: cached response body or None
+        :rtype: bytes | None
+        """
+        if not self.ttl:
+            return None
+        try:
+            return await self.redis.get(f"contacts:response:{etag}")
+        except RedisError:
+            return None
+
+    async def set_response(self, etag: str, body: bytes) -> None:
+        """
+        :param etag: ETag of response
+        :param body: response body
+        :return: Nothing return
+        :rtype: None
+        """
+        if not self.ttl:
+            return
+        try:
+            await self.redis.set(f"contacts:response:{etag}", body, ex=self.ttl)
+        except RedisError:
+            pass
+
+
+user_cache = UserCache(redis_client, ttl=settings.user_cache_ttl,
+                       local=LocalCache(maxsize=settings.user_cache_local_size, ttl=settings.user_cache_local_ttl))
+
+contacts_cache = ContactsCache(redis_client, ttl=settings.contacts_cache_ttl,
+                               version_ttl=settings.contacts_version_ttl)
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import BinaryIO, Iterator, AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.models import User, Contact
+from src.repository import contacts as repository_contacts
+from src.schemas import ContactModel, ContactResponse
+
+"""
+Import and export of contacts in files
+"""
+
+def iter_rows(file: BinaryIO, fmt: str) -> Iterator[tuple[int, dict | Exception]]:
+    """
+    Read rows from file one by one
+
+    :param file: binary file with CSV (with header) or NDJSON (JSON object per line) content
+    :param fmt: format of file, "csv" or "ndjson"
+    :return: iterator of row number and row data (or error if row can not be parsed)
+    :rtype: Iterator[tuple[int, dict | Exception]]
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            yield from enumerate(csv.DictReader(text), start=1)
+            return
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                data = json.loads(line)
+            except ValueError as err:
+                yield number, err
+                continue
+            yield number, data if isinstance(data, dict) else ValueError("JSON object expected")
+    finally:
+        # keep underlying file open, it is closed by owner
+        text.detach()
+
+
+def _errors(err: Exception) -> list[str]:
+    if isinstance(err, ValidationError):
+        return [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in err.errors()]
+    return [str(err)]
+
+
+async def import_contacts(db: AsyncSession, file: BinaryIO, fmt: str, user: User, chunk_size: int = 500,
+                          max_errors: int = 100) -> dict:
+    """
+    Validate and insert contacts from file chunk by chunk, so memory use does not depend on file size
+
+    Invalid rows are skipped and reported, every chunk of valid rows is inserted in separate transaction.
+
+    :param db: connection to DB
+    :param file: binary file with contacts
+    :param fmt: format of file, "csv" or "ndjson"
+    :param user: owner of contacts
+    :param chunk_size: number of rows inserted in one batch
+    :param max_errors: max number of reported row errors
+    :return: number of imported and failed rows with errors of first failed rows
+    :rtype: dict
+    """
+    rows = iter_rows(file, fmt)
+    result = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(numbers: list[int], messages: list[str]) -> None:
+        result["failed"] += len(numbers)
+        for number in numbers:
+            if len(result["errors"]) < max_errors:
+                result["errors"].append({"row": number, "errors": messages})
+
+    last_row = 0
+    while True:
+        try:
+            chunk = await run_in_threadpool(lambda: list(islice(rows, chunk_size)))
+        except (UnicodeDecodeError, csv.Error) as err:
+            # rest of file can not be read
+            fail([last_row + 1], [f"can not read file: {err}"])
+            break
+        if not chunk:
+            break
+        last_row = chunk[-1][0]
+        bodies, numbers = [], []
+        for number, data in chunk:
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                bodies.append(ContactModel.model_validate(data))
+                numbers.append(number)
+            except ValueError as err:
+                fail([number], _errors(err))
+        if not bodies:
+            continue
+        try:
+            result["imported"] += await repository_contacts.create_contacts(db, bodies, user)
+        except SQLAlchemyError as err:
+            await db.rollback()
+            fail(numbers, [f"database error: {type(err).__name__}"])
+    return result
+
+
+EXPORT_FIELDS = ("id", "name", "soname", "email", "phone", "birthday", "info")
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "vcf": "text/vcard",
+}
+
+
+def _vcard_escape(value: str | None) -> str:
+    if not value:
+        return ""
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\r\n", "\\n") \
+        .replace("\n", "\\n")
+
+
+def _format_batch(contacts: list[Contact], fmt: str) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([getattr(contact, field) for field in EXPORT_FIELDS] for contact in contacts)
+        return buffer.getvalue()
+    if fmt == "ndjson":
+        return "".join(ContactResponse.model_validate(contact).model_dump_json() + "\n" for contact in contacts)
+    return "".join(
+        "BEGIN:VCARD\r\n"
+        "VERSION:3.0\r\n"
+        f"N:{_vcard_escape(contact.soname)};{_vcard_escape(contact.name)};;;\r\n"
+        f"FN:{_vcard_escape(f'{contact.name} {contact.soname}')}\r\n"
+        f"EMAIL:{_vcard_escape(contact.email)}\r\n"
+        f"TEL:{_vcard_escape(contact.phone)}\r\n"
+        f"BDAY:{contact.birthday.isoformat() if contact.birthday else ''}\r\n"
+        f"NOTE:{_vcard_escape(contact.info)}\r\n"
+        "END:VCARD\r\n"
+        for contact in contacts
+    )
+
+
+async def export_contacts(session_factory: async_sessionmaker, user: User, fmt: str,
+                          batch_size: int = 500) -> AsyncIterator[str]:
+    """
+    Generate content of export file batch by batch, so memory use does not depend on number of contacts
+
+    Own session is opened, because response body is sent after request dependencies are closed.
+
+    :param session_factory: factory of DB sessions
+    :param user: owner of contacts
+    :param fmt: format of file, "csv", "ndjson" or "vcf"
+    :param batch_size: number of contacts fetched from DB and formatted at once
+    :return: async iterator of file content parts
+    :rtype: AsyncIterator[str]
+    """
+    if fmt == "csv":
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+    async with session_factory() as db:
+        async for contacts in repository_contacts.stream_contacts(db, user, batch_size=batch_size):
+            yield _format_batch(contacts, fmt)
@@ -1,38 +1,210 @@
-from pathlib import Path
+import json
+import time
+import uuid
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
-from src.Settings import settings
+from redis.asyncio import Redis
 
 from src.services.auth import auth_service
+from src.services.redis_client import redis_client
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME=settings.mail_from,
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
-
-
-async def send_email(email: EmailStr, username: str, host: str):
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+"""
+Queue of outbound emails, emails are delivered by separate worker process (src.services.mail_worker)
+"""
+
+
+class MailQueue:
+    """
+    Durable queue of emails in Redis
+
+    New jobs are pushed to list ``<name>:queue``. Worker moves claimed jobs to its own list
+    ``<name>:processing:<worker id>`` and removes them after delivery. Every claim extends lease of worker in
+    sorted set ``<name>:workers``, jobs of worker whose lease expired (worker stopped or crashed) are returned
+    to queue by other workers. Failed jobs wait for next attempt in sorted set ``<name>:retry`` scored by time
+    of attempt, jobs failed too many times are kept in list ``<name>:dead``.
+
+    :param redis: Redis client
+    :param name: prefix of queue keys
+    :param lease: seconds after last claim when jobs of worker are considered lost, must be longer than
+        delivery of one batch
+    :param worker_id: id of worker, random if not given
+    """
+
+    def __init__(self, redis: Redis, name: str = "mail", lease: float = 60, worker_id: str | None = None):
+        self.redis = redis
+        self.name = name
+        self.lease = lease
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self.queue_key = f"{name}:queue"
+        self.workers_key = f"{name}:workers"
+        self.processing_key = self.worker_processing_key(self.worker_id)
+        self.retry_key = f"{name}:retry"
+        self.dead_key = f"{name}:dead"
+
+    def worker_processing_key(self, worker_id: str | bytes) -> str:
+        """
+        :param worker_id: id of worker
+        :return: key of list with jobs claimed by worker
+        :rtype: str
+        """
+        if isinstance(worker_id, bytes):
+            worker_id = worker_id.decode()
+        return f"{self.name}:processing:{worker_id}"
+
+    async def heartbeat(self, now: float | None = None) -> None:
+        """
+        Extend lease of this worker
+
+        :param now: current time, time.time() if not given
+        :return: Nothing return
+        :rtype: None
+        """
+        await self.redis.zadd(self.workers_key, {self.worker_id: (time.time() if now is None else now) + self.lease})
+
+    async def enqueue(self, template: str, recipients: list[str], subject: str, body: dict) -> str:
+        """
+        Add email to queue
+
+        :param template: name of template for email body
+        :param recipients: emails of recipients
+        :param subject: subject of email
+        :param body: variables of template
+        :return: id of job
+        :rtype: str
+        """
+        job = {"id": uuid.uuid4().hex, "template": template, "recipients": [str(r) for r in recipients],
+               "subject": subject, "body": body, "attempts": 0}
+        await self.redis.lpush(self.queue_key, json.dumps(job))
+        return job["id"]
+
+    async def claim(self, count: int, timeout: float = 0) -> list[bytes]:
+        """
+        Move jobs from queue to processing list
+
+        :param count: max number of jobs
+        :param timeout: seconds to wait for first job, do not wait if 0
+        :return: raw jobs, empty list if queue is empty
+        :rtype: list[bytes]
+        """
+        await self.heartbeat()
+        if timeout:
+            raw = await self.redis.blmove(self.queue_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        else:
+            raw = await self.redis.lmove(self.queue_key, self.processing_key, "RIGHT", "LEFT")
+        if raw is None:
+            return []
+        jobs = [raw]
+        if count > 1:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for _ in range(count - 1):
+                    pipe.lmove(self.queue_key, self.processing_key, "RIGHT", "LEFT")
+                jobs.extend(raw for raw in await pipe.execute() if raw is not None)
+        return jobs
+
+    async def ack(self, raw: bytes) -> None:
+        """
+        Remove delivered job from processing list
+
+        :param raw: job returned by claim
+        :return: Nothing return
+        :rtype: None
+        """
+        await self.redis.lrem(self.processing_key, 1, raw)
+
+    async def retry(self, raw: bytes, job: dict, delay: float) -> None:
+        """
+        Schedule next attempt of failed job
+
+        :param raw: job returned by claim
+        :param job: job with updated attempts
+        :param delay: seconds before next attempt
+        :return: Nothing return
+        :rtype: None
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, raw)
+            pipe.zadd(self.retry_key, {json.dumps(job): time.time() + delay})
+            await pipe.execute()
+
+    async def dead(self, raw: bytes, job: dict) -> None:
+        """
+        Move job which can not be delivered to dead list
+
+        :param raw: job returned by claim
+        :param job: job with error description
+        :return: Nothing return
+        :rtype: None
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, raw)
+            pipe.lpush(self.dead_key, json.dumps(job))
+            await pipe.execute()
+
+    async def promote_due(self, now: float | None = None) -> int:
+        """
+        Return jobs which time of retry has come to queue
+
+        :param now: current time, time.time() if not given
+        :return: number of returned jobs
+        :rtype: int
+        """
+        due = await self.redis.zrangebyscore(self.retry_key, "-inf", time.time() if now is None else now)
+        promoted = 0
+        for raw in due:
+            # only one of concurrent workers removes job from retry set
+            if await self.redis.zrem(self.retry_key, raw):
+                await self.redis.rpush(self.queue_key, raw)
+                promoted += 1
+        return promoted
+
+    async def recover(self, now: float | None = None) -> int:
+        """
+        Return jobs of workers whose lease expired to queue, jobs of live workers are not touched
+
+        :param now: current time, time.time() if not given
+        :return: number of returned jobs
+        :rtype: int
+        """
+        expired = await self.redis.zrangebyscore(self.workers_key, "-inf", time.time() if now is None else now)
+        recovered = 0
+        for worker_id in expired:
+            # only one of concurrent workers recovers jobs of expired worker
+            if not await self.redis.zrem(self.workers_key, worker_id):
+                continue
+            key = self.worker_processing_key(worker_id)
+            while await self.redis.lmove(key, self.queue_key, "LEFT", "RIGHT") is not None:
+                recovered += 1
+        return recovered
+
+    async def stats(self) -> dict:
+        """
+        :return: length of queue, processing lists of all workers, retry and dead lists
+        :rtype: dict
+        """
+        workers = await self.redis.zrange(self.workers_key, 0, -1)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.queue_key)
+            pipe.zcard(self.retry_key)
+            pipe.llen(self.dead_key)
+            for worker_id in workers:
+                pipe.llen(self.worker_processing_key(worker_id))
+            queued, retry, dead, *processing = await pipe.execute()
+        return {"queued": queued, "processing": sum(processing), "retry": retry, "dead": dead}
+
+
+mail_queue = MailQueue(redis_client)
+
+
+async def send_email(email: EmailStr, username: str, host: str) -> str:
+    """
+    Queue email with link for confirmation of user email
+
+    :param email: email of new user
+    :param username: name of new user
+    :param host: base URL of service for confirmation link
+    :return: id of queued job
+    :rtype: str
+    """
+    token_verification = auth_service.create_email_token({"sub": email})
+    return await mail_queue.enqueue("email_template.html", [email], "Confirm your email ",
+                                    {"host": host, "username": username, "token": token_verification})
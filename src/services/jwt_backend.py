@@ -0,0 +1,77 @@
+from jose import JWTError, jwt, jwk
+
+"""
+Backends for encode and decode of JWT tokens
+"""
+
+
+class JoseBackend:
+    """
+    JWT backend based on python-jose, signing key is prepared once
+    """
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.algorithm = algorithm
+        self.key = jwk.construct(secret_key, algorithm) if secret_key and algorithm else secret_key
+
+    def encode(self, claims: dict) -> str:
+        """
+        :param claims: token payload
+        :return: signed token
+        :rtype: str
+        """
+        return jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        """
+        :param token: signed token
+        :return: verified token payload
+        :rtype: dict
+        :raises JWTError: if token is invalid or expired
+        """
+        return jwt.decode(token, self.key, algorithms=[self.algorithm])
+
+
+class PyJWTBackend:
+    """
+    JWT backend based on PyJWT (optional dependency), faster than python-jose
+
+    Errors of PyJWT are converted to JWTError of python-jose, so callers handle both backends the same way.
+    """
+
+    def __init__(self, secret_key: str, algorithm: str):
+        import jwt as pyjwt
+
+        self._jwt = pyjwt.PyJWT()
+        self._error = pyjwt.PyJWTError
+        self.algorithm = algorithm
+        self.key = pyjwt.get_algorithm_by_name(algorithm).prepare_key(secret_key) \
+            if secret_key and algorithm else secret_key
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except self._error as err:
+            raise JWTError(str(err)) from err
+
+
+JWT_BACKENDS = {
+    "jose": JoseBackend,
+    "pyjwt": PyJWTBackend,
+}
+
+
+def create_jwt_backend(name: str, secret_key: str, algorithm: str) -> JoseBackend | PyJWTBackend:
+    """
+    Create JWT backend by name
+
+    :param name: name of backend (jose or pyjwt)
+    :param secret_key: key for sign tokens
+    :param algorithm: algorithm for sign tokens
+    :return: JWT backend
+    :rtype: JoseBackend | PyJWTBackend
+    """
+    return JWT_BACKENDS[name](secret_key, algorithm)
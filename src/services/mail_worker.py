@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import signal
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from pathlib import Path
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, TemplateError, select_autoescape
+from redis.exceptions import RedisError
+
+from src.Settings import settings
+from src.services.email import MailQueue
+from src.services.redis_client import create_redis
+
+"""
+Worker process which delivers queued emails, started by ``python -m src.services.mail_worker``
+"""
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+
+
+class TemplateRenderer:
+    """
+    Jinja templates of emails compiled once at worker start
+
+    :param folder: folder with templates
+    """
+
+    def __init__(self, folder: Path = TEMPLATE_FOLDER):
+        self.env = Environment(loader=FileSystemLoader(folder), autoescape=select_autoescape(["html"]),
+                               auto_reload=False)
+        self.templates = {name: self.env.get_template(name) for name in self.env.list_templates()}
+
+    def render(self, name: str, body: dict) -> str:
+        """
+        :param name: name of template
+        :param body: variables of template
+        :return: rendered template
+        :rtype: str
+        """
+        template = self.templates.get(name)
+        if template is None:
+            template = self.templates[name] = self.env.get_template(name)
+        return template.render(**body)
+
+
+class SMTPPool:
+    """
+    Pool of SMTP connections which stay open between emails
+
+    Connection is opened on first use and closed after error, next use opens it again.
+
+    :param size: max number of open connections
+    :param kwargs: arguments of aiosmtplib.SMTP
+    """
+
+    def __init__(self, size: int = 2, username: str = None, password: str = None, **kwargs):
+        self.size = size
+        self.username = username
+        self.password = password
+        self.kwargs = kwargs
+        self.connects = 0
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(None)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(**self.kwargs)
+        await client.connect()
+        if self.username:
+            await client.login(self.username, self.password)
+        self.connects += 1
+        return client
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        :return: connected SMTP client, waits while all connections are in use
+        :rtype: aiosmtplib.SMTP
+        """
+        client = await self._idle.get()
+        try:
+            if client is not None and not client.is_connected:
+                client = None
+            if client is None:
+                client = await self._connect()
+            yield client
+        except BaseException:
+            if client is not None:
+                client.close()
+                client = None
+            raise
+        finally:
+            self._idle.put_nowait(client)
+
+    async def close(self) -> None:
+        """
+        Close all idle connections
+
+        :return: Nothing return
+        :rtype: None
+        """
+        for _ in range(self._idle.qsize()):
+            client = self._idle.get_nowait()
+            if client is not None and client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+            self._idle.put_nowait(None)
+
+
+class MailWorker:
+    """
+    Deliver emails from queue in batches, failed emails are retried with exponential backoff
+
+    :param queue: queue of emails
+    :param pool: pool of SMTP connections
+    :param renderer: templates of emails
+    :param sender: address of sender
+    :param batch_size: max number of emails claimed at once
+    :param max_attempts: attempts before email is moved to dead list
+    :param retry_base: delay (seconds) before first retry, doubled for every next retry
+    :param retry_cap: max delay (seconds) between retries
+    """
+
+    def __init__(self, queue: MailQueue, pool: SMTPPool, renderer: TemplateRenderer, sender: str,
+                 batch_size: int = 20, max_attempts: int = 5, retry_base: float = 2, retry_cap: float = 300):
+        self.queue = queue
+        self.pool = pool
+        self.renderer = renderer
+        self.sender = sender
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+
+    def backoff(self, attempts: int) -> float:
+        """
+        :param attempts: number of failed attempts
+        :return: seconds before next attempt
+        :rtype: float
+        """
+        return min(self.retry_cap, self.retry_base * 2 ** (attempts - 1))
+
+    def build_message(self, job: dict) -> EmailMessage:
+        """
+        :param job: job from queue
+        :return: email with rendered template
+        :rtype: EmailMessage
+        """
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(job["recipients"])
+        message["Subject"] = job["subject"]
+        message.set_content(self.renderer.render(job["template"], job["body"]), subtype="html")
+        return message
+
+    async def deliver(self, raw: bytes) -> bool:
+        """
+        Send one email, failed email is scheduled for retry
+
+        :param raw: job returned by claim
+        :return: True if email is sent
+        :rtype: bool
+        """
+        job = json.loads(raw)
+        try:
+            message = self.build_message(job)
+        except (KeyError, TemplateError) as err:
+            # broken job never succeeds
+            job["error"] = repr(err)
+            await self.queue.dead(raw, job)
+            return False
+        try:
+            async with self.pool.connection() as smtp:
+                await smtp.send_message(message)
+        except (aiosmtplib.SMTPException, OSError) as err:
+            job["attempts"] += 1
+            job["error"] = repr(err)
+            if job["attempts"] >= self.max_attempts:
+                await self.queue.dead(raw, job)
+            else:
+                await self.queue.retry(raw, job, self.backoff(job["attempts"]))
+            return False
+        await self.queue.ack(raw)
+        return True
+
+    async def run_once(self, timeout: float = 0) -> int:
+        """
+        Return due retries and jobs of lost workers to queue, claim batch of emails and send it over pooled
+        connections
+
+        :param timeout: seconds to wait for first email
+        :return: number of sent emails
+        :rtype: int
+        """
+        await self.queue.promote_due()
+        await self.queue.recover()
+        jobs = await self.queue.claim(self.batch_size, timeout)
+        if not jobs:
+            return 0
+        results = await asyncio.gather(*(self.deliver(raw) for raw in jobs))
+        return sum(results)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Deliver emails until stop is set
+
+        :param stop: event which stops worker
+        :return: Nothing return
+        :rtype: None
+        """
+        while not stop.is_set():
+            try:
+                await self.run_once(timeout=1)
+            except RedisError as err:
+                logger.warning("Mail queue is not available: %s", err)
+                await asyncio.sleep(1)
+
+
+def create_worker() -> MailWorker:
+    """
+    :return: worker configured from settings
+    :rtype: MailWorker
+    """
+    pool = SMTPPool(
+        size=settings.mail_pool_size,
+        username=settings.mail_username,
+        password=settings.mail_password,
+        hostname=settings.mail_server,
+        port=settings.mail_port,
+        use_tls=settings.mail_ssl_tls,
+        start_tls=settings.mail_starttls,
+        timeout=settings.mail_timeout,
+    )
+    return MailWorker(MailQueue(create_redis(), lease=settings.mail_worker_lease), pool, TemplateRenderer(), settings.mail_from,
+                      batch_size=settings.mail_batch_size, max_attempts=settings.mail_max_attempts,
+                      retry_base=settings.mail_retry_base, retry_cap=settings.mail_retry_cap)
+
+
+async def main() -> None:
+    worker = create_worker()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await worker.run(stop)
+    finally:
+        await worker.pool.close()
+        await worker.queue.redis.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import Request
+from starlette.responses import Response
+
+"""
+Metrics of requests: latency of routes, SQL statements, Redis commands and JWT decoding
+"""
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Latency of HTTP requests",
+                            ["method", "route", "status"])
+REQUEST_QUERIES = Histogram("http_request_db_queries", "Number of SQL statements per HTTP request",
+                            ["route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+DB_STATEMENT = Histogram("db_statement_duration_seconds", "Duration of SQL statements")
+DB_ERRORS = Counter("db_statement_errors_total", "Failed SQL statements")
+REDIS_COMMAND = Histogram("redis_command_duration_seconds", "Duration of Redis commands", ["command"])
+JWT_DECODE = Histogram("jwt_decode_duration_seconds", "Duration of access token decoding")
+
+_HISTOGRAMS = {"db": DB_STATEMENT, "jwt": JWT_DECODE}
+
+
+class RequestTimings:
+    """
+    Count and total duration of operations of every kind done by one request
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.items: dict[str, list] = {}
+
+    def add(self, kind: str, seconds: float) -> None:
+        item = self.items.setdefault(kind, [0, 0.0])
+        item[0] += 1
+        item[1] += seconds
+
+    def count(self, kind: str) -> int:
+        return self.items.get(kind, (0, 0.0))[0]
+
+    def server_timing(self) -> str:
+        """
+        :return: value of Server-Timing header, durations in milliseconds
+        :rtype: str
+        """
+        parts = [f'{kind};desc="{count} calls";dur={seconds * 1000:.2f}'
+                 for kind, (count, seconds) in self.items.items()]
+        parts.append(f"app;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> RequestTimings | None:
+    """
+    :return: timings of current request or None outside of request
+    :rtype: RequestTimings | None
+    """
+    return _timings.get()
+
+
+def record(kind: str, seconds: float, label: str | None = None) -> None:
+    """
+    Register duration of operation in Prometheus and in timings of current request
+
+    :param kind: "db", "redis" or "jwt"
+    :param seconds: duration of operation
+    :param label: Redis command
+    :return: Nothing return
+    :rtype: None
+    """
+    if kind == "redis":
+        REDIS_COMMAND.labels(label or "unknown").observe(seconds)
+    else:
+        _HISTOGRAMS[kind].observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(kind, seconds)
+
+
+@contextmanager
+def timer(kind: str, label: str | None = None):
+    """
+    Measure duration of block, see record
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, time.perf_counter() - start, label)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Measure every SQL statement executed by engine
+
+    :param engine: async engine
+    :return: Nothing return
+    :rtype: None
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record("db", time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        DB_ERRORS.inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware which measures requests and adds Server-Timing header
+
+    Latency is labeled by route template, requests which did not match any route have route "unmatched".
+
+    :param app: ASGI application
+    :param server_timing: add Server-Timing header to responses
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+        self._routes: dict = {}
+
+    def route_of(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._routes:
+            self._routes[endpoint] = next((route.path for route in scope["app"].routes
+                                           if getattr(route, "endpoint", None) is endpoint), "unmatched")
+        return self._routes[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    message["headers"] = [*message.get("headers", []),
+                                          (b"server-timing", timings.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = self.route_of(scope)
+            REQUEST_LATENCY.labels(scope["method"], route, str(status_code)).observe(
+                time.perf_counter() - timings.start)
+            REQUEST_QUERIES.labels(route).observe(timings.count("db"))
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    Metrics in Prometheus text format
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
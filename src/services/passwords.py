@@ -0,0 +1,123 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+"""
+Password hashing outside of event loop
+"""
+
+_contexts: dict[int, CryptContext] = {}
+
+
+def _context(rounds: int) -> CryptContext:
+    # built once per worker thread/process for every cost factor
+    if rounds not in _contexts:
+        _contexts[rounds] = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return _contexts[rounds]
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    return _context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Run bcrypt hashing and verification in thread or process pool with limited queue
+
+    :param rounds: bcrypt cost factor for new hashes, hashes with other cost are upgraded on verification
+    :param workers: number of threads/processes in pool
+    :param max_queue: max number of calls waiting for free worker, next calls rejected with 503 error
+    :param executor: "thread" or "process"
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, max_queue: int = 64, executor: str = "thread"):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor_type = executor
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many authentication requests, try later")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.wait_total += time.perf_counter() - start
+        self.active += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        """
+        :param password: plain password
+        :return: bcrypt hash of password
+        :rtype: str
+        """
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Verify password and make new hash if stored hash uses outdated scheme or cost factor
+
+        :param password: plain password
+        :param hashed_password: stored hash
+        :return: result of verification and new hash (None if stored hash is up to date)
+        :rtype: tuple[bool, str | None]
+        """
+        return await self._run(_verify_and_update, password, hashed_password, self.rounds)
+
+    def stats(self) -> dict:
+        """
+        :return: pool size, active and queued calls with counters
+        :rtype: dict
+        """
+        return {
+            "executor": self.executor_type,
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_avg_ms": round(self.wait_total / self.completed * 1000, 3) if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
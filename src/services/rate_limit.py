@@ -0,0 +1,223 @@
+import math
+import time
+
+from fastapi import Depends, HTTPException, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.Settings import settings
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.redis_client import redis_client
+
+"""
+Rate limit of requests per user and route with sliding window counters in Redis
+"""
+
+# Sliding window counter: requests of previous window are counted with weight of its part still inside
+# sliding window. Script reserves up to ARGV[4] tokens and returns {granted tokens, retry after ms}.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local used = math.floor(previous * (window - elapsed) / window) + current
+if used >= limit then
+    local retry = window - elapsed
+    if current < limit and previous > 0 then
+        retry = math.ceil(window * (1 - (limit - current) / previous)) - elapsed + 1
+    end
+    return {0, math.max(retry, 1)}
+end
+local granted = math.min(cost, limit - used)
+redis.call('INCRBY', KEYS[1], granted)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {granted, 0}
+"""
+
+
+def parse_limit(limit: str) -> tuple[int, float]:
+    """
+    :param limit: limit in format "times/seconds", e.g. "2/5"
+    :return: times and seconds
+    :rtype: tuple[int, float]
+    """
+    times, seconds = limit.split("/")
+    return int(times), float(seconds)
+
+
+def window_position(seconds: float, now: float) -> tuple[int, int, int]:
+    """
+    :param seconds: length of window
+    :param now: current time
+    :return: window length in ms, number of current window and ms elapsed from start of window
+    :rtype: tuple[int, int, int]
+    """
+    window = int(seconds * 1000)
+    now_ms = int(now * 1000)
+    return window, now_ms // window, now_ms % window
+
+
+class LocalWindows:
+    """
+    In-process sliding window counters, used while Redis is unavailable
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._windows: dict[str, list[int]] = {}
+
+    def hit(self, key: str, times: int, seconds: float, now: float) -> float:
+        """
+        :param key: key of user and route
+        :param times: max number of requests in window
+        :param seconds: length of window
+        :param now: current time
+        :return: 0 if request is allowed, otherwise seconds before next request is allowed
+        :rtype: float
+        """
+        window, index, elapsed = window_position(seconds, now)
+        state = self._windows.get(key)
+        if state is None or state[0] < index - 1:
+            state = [index, 0, 0]
+        elif state[0] == index - 1:
+            state = [index, 0, state[1]]
+        if len(self._windows) >= self.maxsize and key not in self._windows:
+            self._windows.clear()
+        self._windows[key] = state
+        if math.floor(state[2] * (window - elapsed) / window) + state[1] >= times:
+            return (window - elapsed) / 1000
+        state[1] += 1
+        return 0
+
+
+class RateLimiter:
+    """
+    Sliding window rate limiter, one Redis round trip per check
+
+    With batch > 1 worker reserves several tokens by one call and spends them locally until end of window,
+    so only every batch-th request goes to Redis. Reserved tokens are not available to other workers,
+    batch should be small against limits.
+    When Redis fails limits are checked by in-process counters of worker for cooldown seconds.
+
+    :param redis: Redis client
+    :param batch: number of tokens reserved by one call to Redis
+    :param cooldown: seconds Redis is not used after error
+    :param enabled: check limits or allow all requests
+    """
+
+    def __init__(self, redis: Redis, batch: int = 1, cooldown: float = 5, enabled: bool = True,
+                 prefix: str = "ratelimit"):
+        self.redis = redis
+        self.batch = batch
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self.prefix = prefix
+        self.fallback = LocalWindows()
+        self._tokens: dict[str, tuple[int, int]] = {}
+        self._script = None
+        self._script_redis = None
+        self._down_until = 0.0
+        self.allowed = 0
+        self.rejected = 0
+        self.redis_calls = 0
+        self.local_hits = 0
+        self.redis_errors = 0
+
+    def script(self):
+        if self._script is None or self._script_redis is not self.redis:
+            self._script = self.redis.register_script(SLIDING_WINDOW_SCRIPT)
+            self._script_redis = self.redis
+        return self._script
+
+    async def hit(self, key: str, times: int, seconds: float) -> float:
+        """
+        Register request
+
+        :param key: key of user and route
+        :param times: max number of requests in window
+        :param seconds: length of window
+        :return: 0 if request is allowed, otherwise seconds before next request is allowed
+        :rtype: float
+        """
+        if not self.enabled:
+            return 0
+        now = time.time()
+        window, index, elapsed = window_position(seconds, now)
+        tokens = self._tokens.get(key)
+        if tokens is not None and tokens[0] == index and tokens[1] > 0:
+            self._tokens[key] = (index, tokens[1] - 1)
+            self.local_hits += 1
+            self.allowed += 1
+            return 0
+        if now < self._down_until:
+            retry = self.fallback.hit(key, times, seconds, now)
+        else:
+            retry = await self._hit_redis(key, times, window, index, elapsed, now)
+        if retry:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry
+
+    async def _hit_redis(self, key: str, times: int, window: int, index: int, elapsed: int, now: float) -> float:
+        redis_key = f"{self.prefix}:{key}:{window}"
+        try:
+            self.redis_calls += 1
+            granted, retry_ms = await self.script()(keys=[f"{redis_key}:{index}", f"{redis_key}:{index - 1}"],
+                                                    args=[times, window, elapsed, min(self.batch, times)])
+        except RedisError:
+            self.redis_errors += 1
+            self._down_until = now + self.cooldown
+            return self.fallback.hit(key, times, window / 1000, now)
+        if not granted:
+            return retry_ms / 1000
+        if granted > 1:
+            self._tokens[key] = (index, granted - 1)
+        elif key in self._tokens:
+            del self._tokens[key]
+        return 0
+
+    def stats(self) -> dict:
+        """
+        :return: counters of allowed and rejected requests, calls to Redis and locally used tokens
+        :rtype: dict
+        """
+        return {
+            "enabled": self.enabled,
+            "batch": self.batch,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "redis_calls": self.redis_calls,
+            "local_hits": self.local_hits,
+            "redis_errors": self.redis_errors,
+            "redis_available": time.time() >= self._down_until,
+        }
+
+
+rate_limiter = RateLimiter(redis_client, batch=settings.rate_limit_batch, cooldown=settings.rate_limit_cooldown,
+                           enabled=settings.rate_limit_enabled)
+
+
+class RateLimit:
+    """
+    Dependency which limits requests of current user to route, limit may be changed by rate_limits setting
+
+    :param name: name of limit in rate_limits setting
+    :param times: default max number of requests in window
+    :param seconds: default length of window
+    """
+
+    def __init__(self, name: str, times: int, seconds: float, limiter: RateLimiter = rate_limiter):
+        self.name = name
+        self.times, self.seconds = parse_limit(settings.rate_limits[name]) if name in settings.rate_limits \
+            else (times, seconds)
+        self.limiter = limiter
+
+    async def __call__(self, current_user: User = Depends(auth_service.get_current_user)) -> None:
+        retry = await self.limiter.hit(f"{self.name}:{current_user.id}", self.times, self.seconds)
+        if retry:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(retry))})
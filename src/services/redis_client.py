@@ -0,0 +1,59 @@
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
+from src.Settings import settings
+from src.services.metrics import timer
+
+"""
+Shared async Redis client of worker
+"""
+
+
+class TimedPipeline(Pipeline):
+    """
+    Pipeline which measures round trip of all queued commands
+    """
+
+    async def execute(self, raise_on_error: bool = True):
+        with timer("redis", "PIPELINE"):
+            return await super().execute(raise_on_error)
+
+
+class TimedRedis(Redis):
+    """
+    Redis client which measures every command, see src.services.metrics
+    """
+
+    async def execute_command(self, *args, **options):
+        with timer("redis", str(args[0]).split(" ")[0].upper()):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> TimedPipeline:
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def create_redis(**kwargs) -> Redis:
+    """
+    Create async Redis client with pooled connections which reconnect after network errors
+
+    :param kwargs: additional arguments for Redis client
+    :return: Redis client
+    :rtype: Redis
+    """
+    return TimedRedis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=0,
+        max_connections=settings.redis_max_connections,
+        socket_keepalive=True,
+        health_check_interval=30,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.05), 3),
+        retry_on_error=[ConnectionError, TimeoutError],
+        **kwargs,
+    )
+
+
+redis_client = create_redis()
@@ -0,0 +1,28 @@
+import json
+from typing import Iterable, Sequence
+
+"""
+Fast JSON serialization of contacts read from DB as row tuples
+"""
+
+# same keys and order as ContactResponse
+CONTACT_FIELDS = ("name", "soname", "email", "phone", "birthday", "info", "id")
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(",", ":"))
+
+
+def contact_rows_json(rows: Iterable[Sequence]) -> bytes:
+    """
+    JSON list of contacts without validation by ContactResponse
+
+    Data was validated on the way into DB, so output validation only costs time on big lists.
+
+    :param rows: rows in order of repository CONTACT_ROW_COLUMNS (id, name, soname, email, phone, birthday, info)
+    :return: JSON same as ContactResponse list
+    :rtype: bytes
+    """
+    return _encoder.encode([
+        {"name": name, "soname": soname, "email": email, "phone": phone, "birthday": birthday.isoformat(),
+         "info": info, "id": contact_id}
+        for contact_id, name, soname, email, phone, birthday, info in rows
+    ]).encode()
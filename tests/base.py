@@ -0,0 +1,33 @@
+import tempfile
+import unittest
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.database.models import Base
+
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Test case with SQLite databases in temporary folder, which is removed after each test
+    """
+
+    async def asyncSetUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    async def create_engine(self, name: str, tables: bool = True) -> AsyncEngine:
+        """
+        Creates engine of database file in temporary folder, engine is disposed after test
+
+        :param name: name of database file
+        :param tables: create tables of models in database
+        :return: async engine of database
+        :rtype: AsyncEngine
+        """
+        engine = create_async_engine(f"sqlite+aiosqlite:///{self.folder.name}/{name}", poolclass=NullPool)
+        self.addAsyncCleanup(engine.dispose)
+        if tables:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        return engine
@@ -1,20 +1,72 @@
+import tempfile
+from urllib.parse import urlsplit
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import get_db, get_session_factory
+from src.services.metrics import instrument_engine
 
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# test database is created in temporary folder, which is removed when tests finish
+DB_FOLDER = tempfile.TemporaryDirectory()
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_FOLDER.name}/test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# application under test works through async session on the same database file
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_FOLDER.name}/test.db", poolclass=NullPool)
+instrument_engine(async_engine)
+TestingAsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+# N+1 detector: request of application must not issue more SQL statements than its budget
+MAX_STATEMENTS = 10
+# routes returning lists load contacts with one query, so per-row query over contacts of fixtures exceeds budget
+STATEMENT_BUDGETS = {
+    "/api/contacts/": 3,
+    "/api/contacts/page": 3,
+    "/api/contacts/search": 3,
+    "/api/contacts/changes": 3,
+    "/api/contacts/upcoming_birthdays/": 3,
+}
+
+
+class StatementCountingClient(TestClient):
+    """
+    Test client which fails test when request issues more SQL statements than budget of its route
+    (STATEMENT_BUDGETS, MAX_STATEMENTS for other routes), e.g. when relationship or query is loaded
+    per row of result (N+1 queries)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = []
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._capture)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def close(self):
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self._capture)
+        super().close()
+
+    def request(self, method, url, *args, **kwargs):
+        self.statements.clear()
+        response = super().request(method, url, *args, **kwargs)
+        budget = STATEMENT_BUDGETS.get(urlsplit(str(url)).path, MAX_STATEMENTS)
+        assert len(self.statements) <= budget, \
+            f"{method} {url} issued {len(self.statements)} SQL statements:\n" + "\n".join(self.statements)
+        return response
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -34,15 +86,16 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
 
-    yield TestClient(app)
+    client = StatementCountingClient(app)
+    yield client
+    client.close()
 
 
 @pytest.fixture(scope="module")
@@ -0,0 +1,30 @@
+import unittest
+
+from benchmarks.load import percentile, summarize, compare
+
+
+class TestLoadReport(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([0.2], 95), 0.2)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summarize(self):
+        summary = summarize([0.003, 0.001, 0.002, 0.004], errors=1, elapsed=0.5)
+        self.assertEqual(summary, {"requests": 4, "errors": 1, "rps": 8.0, "p50_ms": 2.0, "p95_ms": 4.0,
+                                   "p99_ms": 4.0})
+
+    def test_compare(self):
+        baseline = {"search": {"p95_ms": 10.0, "rps": 100.0, "errors": 0}}
+        self.assertEqual(compare({"search": {"p95_ms": 11.0, "rps": 90.0, "errors": 0}}, baseline, 0.2), [])
+        regressions = compare({"search": {"p95_ms": 13.0, "rps": 70.0, "errors": 2},
+                               "login": {"p95_ms": 99.0, "rps": 1.0, "errors": 0}}, baseline, 0.2)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(all(regression.startswith("search") for regression in regressions))
+
+
+if __name__ == '__main__':
+    unittest.main()
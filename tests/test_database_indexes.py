@@ -0,0 +1,78 @@
+import datetime
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.database.models import Contact, User
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+from src.schemas import ContactModel
+from tests.base import DatabaseTestCase
+
+
+class TestIndexes(DatabaseTestCase):
+    """
+    Run repository queries and check by EXPLAIN QUERY PLAN that SQLite uses expected indexes
+    """
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.engine = await self.create_engine("test_indexes.db")
+        self.session = async_sessionmaker(bind=self.engine, expire_on_commit=False)()
+        self.user = User(id=1, name="I", email="I@gmail.com", password="123")
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._capture)
+
+    async def asyncTearDown(self):
+        event.remove(self.engine.sync_engine, "before_cursor_execute", self._capture)
+        await self.session.close()
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    async def query_plan(self) -> str:
+        statement, parameters = self.statements[-1]
+        async with self.engine.connect() as conn:
+            result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return "\n".join(row[-1] for row in result)
+
+    async def test_get_user_by_email(self):
+        await repository_users.get_user_by_email(self.session, "I@gmail.com")
+        self.assertIn("INDEX ix_users_email", await self.query_plan())
+
+    async def test_get_contacts_page(self):
+        await repository_contacts.get_contacts_page(self.session, self.user, cursor=repository_contacts.encode_cursor(5))
+        self.assertIn("INDEX ix_contacts_user_id_id", await self.query_plan())
+
+    async def test_get_contact_name_soname(self):
+        await repository_contacts.get_contact_(self.session, "John", "Wick", None, user=self.user)
+        self.assertIn("INDEX ix_contacts_user_id_soname_name", await self.query_plan())
+
+    async def test_get_contact_email(self):
+        await repository_contacts.get_contact_(self.session, None, None, "John.Wick@gmail.com", user=self.user)
+        self.assertIn("INDEX ix_contacts_user_id_email", await self.query_plan())
+
+    async def test_get_upcoming_birthdays(self):
+        await repository_contacts.get_upcoming_birthdays(self.session, self.user)
+        self.assertIn("INDEX ix_contacts_user_id_birth_md", await self.query_plan())
+
+    async def test_statements_filter_by_partition_key(self):
+        self.session.add(Contact(id=1, name="John", soname="Wick", email="john.wick@gmail.com", phone="1",
+                                 birthday=datetime.date(1980, 8, 22), info="", user_id=1))
+        await self.session.commit()
+        body = ContactModel(name="John", soname="Wick", email="john.wick@gmail.com", phone="2",
+                            birthday=datetime.date(1980, 8, 22), info="changed")
+        self.statements.clear()
+        with patch.object(repository_contacts.contacts_cache, "bump", AsyncMock()):
+            await repository_contacts.update_contact_by_id(self.session, 1, body, self.user)
+            await repository_contacts.delete_contact(self.session, 1, self.user)
+        contacts = [statement for statement, _ in self.statements if "contacts" in statement]
+        self.assertTrue(any(statement.startswith("UPDATE") for statement in contacts))
+        for statement in contacts:
+            self.assertIn("contacts.user_id = ?", statement)
+
+
+if __name__ == "__main__":
+    unittest.main()
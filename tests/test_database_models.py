@@ -0,0 +1,51 @@
+import datetime
+import unittest
+
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from src.database.models import Contact, User
+from tests.base import DatabaseTestCase
+
+
+class TestRelationships(DatabaseTestCase):
+    """
+    Relationships are never loaded implicitly, so serialization can not issue hidden query per row
+    """
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.engine = await self.create_engine("test_models.db")
+        async with AsyncSession(self.engine) as db:
+            db.add(User(id=1, name="I", email="I@gmail.com", password="123"))
+            db.add_all(Contact(id=n, name="John", soname="Wick", email=f"john{n}@gmail.com", phone="1",
+                               birthday=datetime.date(1980, 8, 22), info="", user_id=1) for n in range(1, 4))
+            await db.commit()
+
+    async def test_lazy_load_raises(self):
+        async with AsyncSession(self.engine) as db:
+            contact = await db.scalar(select(Contact).where(Contact.user_id == 1).limit(1))
+            with self.assertRaises(InvalidRequestError):
+                contact.users
+            user = await db.get(User, 1)
+            with self.assertRaises(InvalidRequestError):
+                user.contacts
+
+    async def test_selectinload(self):
+        async with AsyncSession(self.engine) as db:
+            user = await db.scalar(select(User).where(User.id == 1).options(selectinload(User.contacts)))
+            self.assertEqual(len(user.contacts), 3)
+            contacts = await db.scalars(select(Contact).options(selectinload(Contact.users)))
+            self.assertEqual({contact.users.email for contact in contacts}, {"I@gmail.com"})
+
+    async def test_delete_user_without_loading_contacts(self):
+        async with AsyncSession(self.engine) as db:
+            await db.delete(await db.get(User, 1))
+            await db.commit()
+            self.assertIsNone(await db.get(User, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from src.database.models import Contact, User
+from src.repository.contacts import search_contacts
+from tests.base import DatabaseTestCase
+
+
+class TestSearchContacts(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.engine = await self.create_engine("test_search.db")
+        self.session = async_sessionmaker(bind=self.engine, expire_on_commit=False)()
+        self.user = User(id=1, name="I", email="I@gmail.com", password="123")
+        self.session.add_all([
+            User(id=2, name="You", email="you@gmail.com", password="123"),
+            self.user,
+            Contact(id=1, name="Ozzy", soname="Osborn", email="ozzy@gmail.com", phone="6666666666",
+                    birthday=datetime.date(1968, 9, 1), info="friend of john", user_id=1),
+            Contact(id=2, name="John", soname="Wick", email="john.wick@gmail.com", phone="123456789",
+                    birthday=datetime.date(1980, 8, 22), info=None, user_id=1),
+            Contact(id=3, name="John", soname="Doe", email="john.doe@gmail.com", phone="555",
+                    birthday=datetime.date(1980, 8, 22), info=None, user_id=2),
+        ])
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+
+    async def test_search_prefix_first(self):
+        result = await search_contacts(self.session, "joh", self.user)
+        self.assertListEqual([contact.id for contact in result], [2, 1])
+
+    async def test_search_case_insensitive(self):
+        result = await search_contacts(self.session, "WICK", self.user)
+        self.assertListEqual([contact.id for contact in result], [2])
+
+    async def test_search_phone(self):
+        result = await search_contacts(self.session, "666", self.user)
+        self.assertListEqual([contact.id for contact in result], [1])
+
+    async def test_search_like_wildcards_escaped(self):
+        result = await search_contacts(self.session, "%", self.user)
+        self.assertListEqual(result, [])
+
+    async def test_search_postgresql_trigram(self):
+        session = MagicMock(spec=AsyncSession)
+        session.get_bind().dialect.name = "postgresql"
+        session.execute.return_value = MagicMock()
+        await search_contacts(session, "joh", self.user)
+        sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("similarity(contacts.name", sql)
+        self.assertIn("contacts.name %", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,25 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
+
+from redis.exceptions import ConnectionError
 
 from src.database.models import User
 from src.services.auth import auth_service
 
 
+def test_create_user_mail_queue_unavailable(client, session, monkeypatch):
+    monkeypatch.setattr("src.routes.auth.send_email", AsyncMock(side_effect=ConnectionError("Redis is down")))
+    response = client.post(
+        "/auth/auth/signup",
+        json={"name": "cable", "email": "cable@example.com", "password": "123456789"},
+    )
+    assert response.status_code == 201, response.text
+    assert response.json()["user"]["email"] == "cable@example.com"
+    session.query(User).filter(User.email == "cable@example.com").delete()
+    session.commit()
+
+
 def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
+    mock_send_email = AsyncMock()
     monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
     response = client.post(
         "/auth/auth/signup",
@@ -15,6 +29,7 @@ def test_create_user(client, user, monkeypatch):
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    mock_send_email.assert_awaited_once()
 
 
 def test_repeat_create_user(client, user):
@@ -40,6 +55,7 @@ def test_login_user_not_confirmed(client, user):
 def test_login_wrong_password(client, session, user):
     current_user: User = session.query(User).filter(User.email == user.get('email')).first()
     current_user.email_confirmed = True
+    session.commit()
     response = client.post(
         "/auth/auth/login",
         data={"username": user.get('email'), "password": 'password'},
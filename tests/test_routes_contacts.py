@@ -0,0 +1,233 @@
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from redis.exceptions import ConnectionError
+
+from main import app
+from src.Settings import settings
+from src.database.models import User, Contact
+from src.services.auth import auth_service
+from src.services.cache import contacts_cache
+from src.services.rate_limit import rate_limiter
+
+
+@pytest.fixture(scope="module")
+def current_user(session):
+    user = User(id=1, name="wolverine", email="wolverine@example.com", password="123456789", email_confirmed=True)
+    session.add(user)
+    session.add_all([
+        Contact(id=1, name="John", soname="Wick", email="john.wick@gmail.com", phone="123456789",
+                birthday=datetime.date(1980, 8, 22), info="", user_id=1),
+        Contact(id=2, name="Ozzy", soname="Osborn", email="ozzy@gmail.com", phone="6666666666",
+                birthday=datetime.date(1968, 12, 3), info="", user_id=1),
+        Contact(id=3, name="John", soname="Doe", email="john.doe@gmail.com", phone="555",
+                birthday=datetime.date(1980, 8, 22), info="", user_id=1),
+    ])
+    session.commit()
+    yield User(id=1, name=user.name, email=user.email, password=None, email_confirmed=True)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def auth_client(client, current_user):
+    rate_limiter.enabled = False
+    app.dependency_overrides[auth_service.get_current_user] = lambda: current_user
+    redis, contacts_cache.redis = contacts_cache.redis, FakeRedis()
+    yield client
+    contacts_cache.redis = redis
+    del app.dependency_overrides[auth_service.get_current_user]
+    rate_limiter.enabled = True
+
+
+def test_read_contacts_not_modified(client):
+    response = client.get("/api/contacts/")
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"1-')
+    response = client.get("/api/contacts/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = client.get("/api/contacts/", params={"limit": 1}, headers={"If-None-Match": etag})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 1
+
+
+def test_read_by_id_etag_changed(client):
+    response = client.get("/api/contacts/1")
+    etag = response.headers["ETag"]
+    assert client.get("/api/contacts/1", headers={"If-None-Match": etag}).status_code == 304
+    client.patch("/api/contacts/1", json={"info": "changed"})
+    response = client.get("/api/contacts/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.json()["info"] == "changed"
+    assert response.headers["ETag"] != etag
+
+
+def test_read_by_id_version_bump_failed(client, monkeypatch):
+    response = client.get("/api/contacts/1")
+    etag = response.headers["ETag"]
+    monkeypatch.setattr(contacts_cache.redis, "pipeline", MagicMock(side_effect=ConnectionError))
+    monkeypatch.setattr(contacts_cache.redis, "incr", AsyncMock(side_effect=ConnectionError))
+    client.patch("/api/contacts/1", json={"info": "bump failed"})
+    monkeypatch.undo()
+    response = client.get("/api/contacts/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.json()["info"] == "bump failed"
+    assert response.headers["ETag"] != etag
+
+
+def test_server_timing_and_metrics(client):
+    response = client.get("/api/contacts/page", params={"limit": 2})
+    timing = response.headers["Server-Timing"]
+    assert 'db;desc="1 calls"' in timing
+    assert "app;dur=" in timing
+    metrics = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/contacts/page",status="200"}' in metrics
+    assert 'http_request_db_queries_count{route="/api/contacts/page"}' in metrics
+
+
+def test_read_by_id_not_found(client):
+    response = client.get("/api/contacts/99")
+    assert response.status_code == 404, response.text
+
+
+def test_export(client):
+    response = client.get("/api/contacts/export")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "id,name,soname,email,phone,birthday,info"
+    assert [line.split(",")[:3] for line in lines[1:]] == [["1", "John", "Wick"], ["2", "Ozzy", "Osborn"],
+                                                            ["3", "John", "Doe"]]
+    response = client.get("/api/contacts/export", params={"fmt": "vcf"})
+    assert response.status_code == 200, response.text
+    assert response.text.count("BEGIN:VCARD") == 3
+    assert "FN:Ozzy Osborn" in response.text
+
+
+def test_patch_contact(client):
+    response = client.patch("/api/contacts/2", json={"phone": "777", "info": "singer"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["id"], data["name"], data["phone"], data["info"]) == (2, "Ozzy", "777", "singer")
+
+
+def test_patch_contact_not_found(client):
+    response = client.patch("/api/contacts/99", json={"phone": "777"})
+    assert response.status_code == 404, response.text
+
+
+def test_patch_contact_invalid(client):
+    response = client.patch("/api/contacts/2", json={"email": "not email"})
+    assert response.status_code == 422, response.text
+    for field in ("name", "soname", "email", "phone", "birthday", "info"):
+        response = client.patch("/api/contacts/2", json={field: None})
+        assert response.status_code == 422, f"{field}: {response.text}"
+    response = client.get("/api/contacts/2")
+    assert response.status_code == 200, response.text
+    assert response.json()["soname"] == "Osborn"
+
+
+def test_batch_update(client):
+    response = client.post("/api/contacts/batch_update", json={"ids": [1, 3, 99], "patch": {"phone": "000"}})
+    assert response.status_code == 200, response.text
+    assert response.json() == [{"id": 1, "status": "updated"}, {"id": 3, "status": "updated"},
+                               {"id": 99, "status": "not_found"}]
+    response = client.get("/api/contacts/1")
+    assert response.json()["phone"] == "000"
+    assert response.json()["name"] == "John"
+
+
+def test_batch_update_null_field(client):
+    for field in ("name", "soname", "email", "phone", "birthday", "info"):
+        response = client.post("/api/contacts/batch_update", json={"ids": [3], "patch": {field: None}})
+        assert response.status_code == 422, f"{field}: {response.text}"
+    response = client.get("/api/contacts/3")
+    assert response.status_code == 200, response.text
+    assert response.json()["phone"] == "000"
+
+
+def test_batch_update_filter(client):
+    response = client.post("/api/contacts/batch_update",
+                           json={"filter": {"name": "John"}, "patch": {"birthday": "1990-01-02"}})
+    assert response.status_code == 200, response.text
+    assert [item["id"] for item in response.json()] == [1, 3]
+    response = client.get("/api/contacts/3")
+    assert response.json()["birthday"] == "1990-01-02"
+
+
+def test_batch_update_nothing(client):
+    response = client.post("/api/contacts/batch_update", json={"ids": [1], "patch": {}})
+    assert response.status_code == 400, response.text
+
+
+def test_batch_without_selection(client):
+    response = client.post("/api/contacts/batch_delete", json={"filter": {}})
+    assert response.status_code == 422, response.text
+
+
+def test_batch_delete(client):
+    response = client.post("/api/contacts/batch_delete", json={"ids": [2, 3, 3, 99]})
+    assert response.status_code == 200, response.text
+    assert response.json() == [{"id": 2, "status": "deleted"}, {"id": 3, "status": "deleted"},
+                               {"id": 99, "status": "not_found"}]
+    response = client.get("/api/contacts/")
+    assert [item["id"] for item in response.json()] == [1]
+
+
+def test_changes(client, monkeypatch):
+    monkeypatch.setattr(settings, "sync_overlap", 0)
+    response = client.get("/api/contacts/changes")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert sorted((change["id"], change["deleted"]) for change in data["changes"]) == [(1, False), (2, True), (3, True)]
+    assert all(change["contact"] is None for change in data["changes"] if change["deleted"])
+    assert data["has_more"] is False
+    since, after_id = data["next_since"], data["next_after_id"]
+    response = client.get("/api/contacts/changes", params={"since": since, "after_id": after_id})
+    assert response.json()["changes"] == []
+    client.patch("/api/contacts/1", json={"info": "synced"})
+    client.post("/api/contacts/", json={"name": "Tony", "soname": "Stark", "email": "tony@stark.com",
+                                        "phone": "3000", "birthday": "1970-05-29", "info": ""})
+    response = client.get("/api/contacts/changes", params={"since": since, "after_id": after_id, "limit": 1})
+    data = response.json()
+    assert [change["contact"]["info"] for change in data["changes"]] == ["synced"]
+    assert data["has_more"] is True
+    response = client.get("/api/contacts/changes",
+                          params={"since": data["next_since"], "after_id": data["next_after_id"]})
+    data = response.json()
+    assert [change["contact"]["name"] for change in data["changes"]] == ["Tony"]
+    assert data["has_more"] is False
+
+
+def test_changes_overlap(client, session):
+    response = client.get("/api/contacts/changes")
+    data = response.json()
+    last = max(datetime.datetime.fromisoformat(change["updated_at"]) for change in data["changes"])
+    next_since = datetime.datetime.fromisoformat(data["next_since"])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    assert next_since <= now - datetime.timedelta(seconds=settings.sync_overlap)
+    assert data["has_more"] is False
+    # change stamped before last returned change, but committed after response
+    session.add(Contact(id=10, name="Late", soname="Commit", email="late@gmail.com", phone="1",
+                        birthday=datetime.date(1990, 1, 1), info="", user_id=1,
+                        updated_at=last.replace(tzinfo=None) - datetime.timedelta(seconds=1)))
+    session.commit()
+    response = client.get("/api/contacts/changes",
+                          params={"since": data["next_since"], "after_id": data["next_after_id"]})
+    assert 10 in [change["id"] for change in response.json()["changes"]]
+
+
+def test_rate_limit(client):
+    redis, rate_limiter.redis, rate_limiter.enabled = rate_limiter.redis, FakeRedis(), True
+    try:
+        assert client.get("/api/contacts/1").status_code == 200
+        assert client.get("/api/contacts/1").status_code == 200
+        response = client.get("/api/contacts/1")
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["Retry-After"]) <= 5
+        # other route has its own limit
+        assert client.get("/api/contacts/").status_code == 200
+    finally:
+        rate_limiter.redis, rate_limiter.enabled = redis, False
@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+from src.Settings import settings
+
+
+def test_service_disabled_without_token(client):
+    with patch.object(settings, "service_token", ""):
+        response = client.get("/service/db_pool", headers={"X-Service-Token": ""})
+    assert response.status_code == 404, response.text
+
+
+def test_service_wrong_token(client):
+    with patch.object(settings, "service_token", "internal"):
+        response = client.get("/service/db_pool")
+        assert response.status_code == 403, response.text
+        response = client.get("/service/db_pool", headers={"X-Service-Token": "guess"})
+        assert response.status_code == 403, response.text
+
+
+def test_service_token(client):
+    with patch.object(settings, "service_token", "internal"):
+        response = client.get("/service/db_replicas", headers={"X-Service-Token": "internal"})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"replicas": [], "primary_reads": 0}
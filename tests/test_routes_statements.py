@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main import app
+from src.database.db import get_db
+from src.database.models import User, Contact
+from src.services.auth import auth_service
+from src.services.cache import contacts_cache
+from src.services.rate_limit import rate_limiter
+
+# more contacts than default budget of statements, so any per-row query fails the test
+CONTACTS = 12
+
+
+@pytest.fixture(scope="module")
+def current_user(session):
+    user = User(id=1, name="wolverine", email="wolverine@example.com", password="123456789", email_confirmed=True)
+    session.add(user)
+    session.add_all([
+        Contact(id=i, name=f"John{i}", soname="Wick", email=f"john{i}@gmail.com", phone=f"12345{i}",
+                birthday=datetime.date(1980, 8, 22), info="", user_id=1)
+        for i in range(1, CONTACTS + 1)
+    ])
+    session.commit()
+    yield User(id=1, name=user.name, email=user.email, password=None, email_confirmed=True)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def auth_client(client, current_user):
+    rate_limiter.enabled = False
+    app.dependency_overrides[auth_service.get_current_user] = lambda: current_user
+    redis, contacts_cache.redis = contacts_cache.redis, FakeRedis()
+    yield client
+    contacts_cache.redis = redis
+    del app.dependency_overrides[auth_service.get_current_user]
+    rate_limiter.enabled = True
+
+
+@pytest.mark.parametrize("url, params", [
+    ("/api/contacts/", {"limit": CONTACTS}),
+    ("/api/contacts/page", {"limit": CONTACTS}),
+    ("/api/contacts/search", {"q": "John", "limit": CONTACTS}),
+    ("/api/contacts/changes", {"limit": CONTACTS}),
+    ("/api/contacts/upcoming_birthdays/", {}),
+])
+def test_list_routes_within_budget(client, url, params):
+    response = client.get(url, params=params)
+    assert response.status_code == 200, response.text
+
+
+def test_per_row_queries_fail(client):
+    async def read_one_by_one(db: AsyncSession = Depends(get_db)):
+        ids = (await db.execute(select(Contact.id))).scalars().all()
+        return [(await db.execute(select(Contact.name).where(Contact.id == contact_id))).scalar() for contact_id in ids]
+
+    app.add_api_route("/n_plus_one", read_one_by_one)
+    try:
+        with pytest.raises(AssertionError, match="issued 13 SQL statements"):
+            client.get("/n_plus_one")
+    finally:
+        app.router.routes.pop()
@@ -0,0 +1,38 @@
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+
+from main import app
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.avatars import avatar_service
+
+
+def image_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 30), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def current_user(session):
+    data = image_bytes()
+    avatar = f"/static/avatars/7/{hashlib.sha256(data).hexdigest()[:32]}-{avatar_service.size}.png"
+    session.add(User(id=7, name="storm", email="storm@example.com", password="hash", avatar=avatar,
+                     email_confirmed=True))
+    session.commit()
+    # user from cache has no password
+    user = User(id=7, name="storm", email="storm@example.com", password=None, avatar=avatar, email_confirmed=True)
+    app.dependency_overrides[auth_service.get_current_user] = lambda: user
+    yield user
+    del app.dependency_overrides[auth_service.get_current_user]
+
+
+def test_update_avatar_not_changed(client, current_user):
+    skipped = avatar_service.skipped
+    response = client.patch("/user/users/avatar", files={"file": ("avatar.png", image_bytes(), "image/png")})
+    assert response.status_code == 200, response.text
+    assert response.json()["avatar"] == current_user.avatar
+    assert avatar_service.skipped == skipped + 1
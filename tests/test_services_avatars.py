@@ -0,0 +1,74 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from src.database.models import User
+from src.services.avatars import AvatarService, LocalStorage, resize_avatar
+
+
+def image_bytes(width: int, height: int, fmt: str = "PNG") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 10, 10)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="avatar.png")
+
+
+class TestAvatarService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.folder.name, "http://test/static/avatars/")
+        self.service = AvatarService(self.storage, max_bytes=200_000, size=250, workers=1)
+        self.user = User(id=7, name="I", email="I@gmail.com", password="hash")
+
+    def tearDown(self):
+        self.service.shutdown()
+        self.folder.cleanup()
+
+    def test_resize_to_square(self):
+        with Image.open(io.BytesIO(resize_avatar(image_bytes(800, 400), 250))) as avatar:
+            self.assertEqual(avatar.size, (250, 250))
+            self.assertEqual(avatar.format, "JPEG")
+
+    def test_resize_not_image(self):
+        with self.assertRaises(ValueError):
+            resize_avatar(b"not an image")
+
+    async def test_upload_to_local_storage(self):
+        url = await self.service.upload(self.user, upload(image_bytes(300, 500)))
+        self.assertTrue(url.startswith("http://test/static/avatars/7/"))
+        files = list(Path(self.folder.name).rglob("*.jpg"))
+        self.assertEqual(len(files), 1)
+        self.assertEqual(url, f"http://test/static/avatars/{files[0].relative_to(self.folder.name).as_posix()}")
+        self.assertEqual(self.service.uploads, 1)
+
+    async def test_same_content_skipped(self):
+        data = image_bytes(300, 300)
+        self.user.avatar = await self.service.upload(self.user, upload(data))
+        self.service.storage = MagicMock()
+        self.assertEqual(await self.service.upload(self.user, upload(data)), self.user.avatar)
+        self.service.storage.save.assert_not_called()
+        self.assertEqual(self.service.skipped, 1)
+
+    async def test_too_big(self):
+        with self.assertRaises(HTTPException) as err:
+            await self.service.upload(self.user, upload(b"x" * 200_001))
+        self.assertEqual(err.exception.status_code, 413)
+
+    async def test_not_image(self):
+        with self.assertRaises(HTTPException) as err:
+            await self.service.upload(self.user, upload(b"text"))
+        self.assertEqual(err.exception.status_code, 422)
+        self.assertEqual(self.service.uploads, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import csv
+import datetime
+import io
+import json
+import unittest
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.database.models import Contact, User
+from src.services.contacts_io import import_contacts, export_contacts
+from tests.base import DatabaseTestCase
+
+
+class TestImportContacts(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.engine = await self.create_engine("test_contacts_io.db")
+        self.session = async_sessionmaker(bind=self.engine, expire_on_commit=False)()
+        self.user = User(id=1, name="I", email="I@gmail.com", password="123")
+        self.session.add(self.user)
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+
+    async def count(self) -> int:
+        return await self.session.scalar(select(func.count()).select_from(Contact))
+
+    async def test_import_csv(self):
+        file = io.BytesIO(
+            b"name,soname,email,phone,birthday,info\r\n"
+            b"John,Wick,john.wick@gmail.com,123456789,1980-08-22,\"hitman,\r\nretired\"\r\n"
+            b"Ozzy,Osborn,not email,6666666666,1968-09-01,\r\n"
+            b"Ozzy,Osborn,ozzy@gmail.com,6666666666,1968-12-03,singer\r\n"
+        )
+        result = await import_contacts(self.session, file, "csv", self.user, chunk_size=2)
+        self.assertEqual((result["imported"], result["failed"]), (2, 1))
+        self.assertEqual(result["errors"][0]["row"], 2)
+        self.assertIn("email", result["errors"][0]["errors"][0])
+        self.assertEqual(await self.count(), 2)
+        contact = await self.session.scalar(select(Contact).filter_by(soname="Wick"))
+        self.assertEqual((contact.info, contact.birth_md, contact.user_id), ("hitman,\r\nretired", 822, 1))
+
+    async def test_import_ndjson(self):
+        row = {"name": "John", "soname": "Wick", "email": "john.wick@gmail.com", "phone": "123456789",
+               "birthday": "1980-08-22", "info": ""}
+        file = io.BytesIO(b"\n".join([json.dumps(row).encode(), b"{broken", b"", b"[1]", json.dumps(row).encode()]))
+        result = await import_contacts(self.session, file, "ndjson", self.user)
+        self.assertEqual((result["imported"], result["failed"]), (2, 2))
+        self.assertListEqual([error["row"] for error in result["errors"]], [2, 3])
+        self.assertEqual(await self.count(), 2)
+
+    async def test_import_max_errors(self):
+        file = io.BytesIO(b"name,soname\n" + b"a,b\n" * 10)
+        result = await import_contacts(self.session, file, "csv", self.user, max_errors=3)
+        self.assertEqual((result["imported"], result["failed"], len(result["errors"])), (0, 10, 3))
+
+
+class TestExportContacts(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.engine = await self.create_engine("test_contacts_io.db")
+        self.session_factory = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.user = User(id=1, name="I", email="I@gmail.com", password="123")
+        async with self.session_factory() as session:
+            session.add_all([
+                User(id=2, name="You", email="you@gmail.com", password="123"),
+                self.user,
+                Contact(id=1, name="John", soname="Wick", email="john.wick@gmail.com", phone="123456789",
+                        birthday=datetime.date(1980, 8, 22), info="hitman; retired", user_id=1),
+                Contact(id=2, name="Ozzy", soname="Osborn", email="ozzy@gmail.com", phone="6666666666",
+                        birthday=datetime.date(1968, 12, 3), info="singer", user_id=1),
+                Contact(id=3, name="John", soname="Doe", email="john.doe@gmail.com", phone="555",
+                        birthday=datetime.date(1980, 8, 22), info=None, user_id=2),
+            ])
+            await session.commit()
+
+    async def export(self, fmt: str) -> list[str]:
+        return [part async for part in export_contacts(self.session_factory, self.user, fmt, batch_size=1)]
+
+    async def test_export_csv(self):
+        parts = await self.export("csv")
+        self.assertEqual(len(parts), 3)
+        rows = list(csv.DictReader(io.StringIO("".join(parts))))
+        self.assertListEqual([row["soname"] for row in rows], ["Wick", "Osborn"])
+        self.assertEqual(rows[0]["birthday"], "1980-08-22")
+
+    async def test_export_ndjson(self):
+        lines = "".join(await self.export("ndjson")).splitlines()
+        self.assertListEqual([json.loads(line)["id"] for line in lines], [1, 2])
+
+    async def test_export_vcard(self):
+        content = "".join(await self.export("vcf"))
+        self.assertEqual(content.count("BEGIN:VCARD"), 2)
+        self.assertIn("N:Wick;John;;;\r\n", content)
+        self.assertIn("NOTE:hitman\\; retired\r\n", content)
+
+    async def test_export_roundtrip(self):
+        file = io.BytesIO("".join(await self.export("csv")).encode())
+        async with self.session_factory() as session:
+            result = await import_contacts(session, file, "csv", self.user)
+        self.assertEqual((result["imported"], result["failed"]), (2, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
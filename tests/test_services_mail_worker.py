@@ -0,0 +1,118 @@
+import json
+import socket
+import time
+import unittest
+
+from aiosmtpd.controller import Controller
+from fakeredis.aioredis import FakeRedis
+
+from src.services.email import MailQueue
+from src.services.mail_worker import MailWorker, SMTPPool, TemplateRenderer
+
+
+class Handler:
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.reject = set()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.reject:
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        return "250 Message accepted"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestMailWorker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = Handler()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=free_port())
+        self.controller.start()
+
+    async def asyncSetUp(self):
+        self.redis = FakeRedis()
+        self.queue = MailQueue(self.redis, name="test-mail")
+        self.pool = SMTPPool(size=2, hostname="127.0.0.1", port=self.controller.port, use_tls=False,
+                             start_tls=False, timeout=5)
+        self.worker = MailWorker(self.queue, self.pool, TemplateRenderer(), "service@example.com",
+                                 batch_size=10, max_attempts=2, retry_base=60)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        await self.redis.aclose()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    async def enqueue(self, email: str):
+        return await self.queue.enqueue("email_template.html", [email], "Confirm your email",
+                                        {"host": "http://test/", "username": "John", "token": "abc"})
+
+    async def test_batch_over_pooled_connections(self):
+        for n in range(6):
+            await self.enqueue(f"user{n}@example.com")
+        self.assertEqual(await self.worker.run_once(), 6)
+        self.assertEqual(await self.worker.run_once(), 0)
+        self.assertEqual(len(self.handler.messages), 6)
+        self.assertLessEqual(self.pool.connects, 2)
+        self.assertEqual(self.handler.connections, self.pool.connects)
+        recipients, content = self.handler.messages[0]
+        self.assertIn("http://test/auth/auth/confirmed_email/abc", content)
+        self.assertEqual(await self.queue.stats(), {"queued": 0, "processing": 0, "retry": 0, "dead": 0})
+
+    async def test_retry_with_backoff_then_dead(self):
+        self.handler.reject.add("late@example.com")
+        await self.enqueue("late@example.com")
+        await self.enqueue("ok@example.com")
+        self.assertEqual(await self.worker.run_once(), 1)
+        self.assertEqual(await self.queue.stats(), {"queued": 0, "processing": 0, "retry": 1, "dead": 0})
+        # not due yet
+        self.assertEqual(await self.queue.promote_due(), 0)
+        (raw, score), = await self.redis.zrange(self.queue.retry_key, 0, -1, withscores=True)
+        self.assertEqual(json.loads(raw)["attempts"], 1)
+        self.assertEqual(await self.queue.promote_due(now=score), 1)
+        self.assertEqual(await self.worker.run_once(), 0)
+        self.assertEqual(await self.queue.stats(), {"queued": 0, "processing": 0, "retry": 0, "dead": 1})
+        dead = json.loads(await self.redis.lindex(self.queue.dead_key, 0))
+        self.assertEqual(dead["attempts"], 2)
+        self.assertIn("451", dead["error"])
+
+    async def test_unknown_template_is_dead(self):
+        await self.queue.enqueue("missing.html", ["user@example.com"], "Subject", {})
+        self.assertEqual(await self.worker.run_once(), 0)
+        self.assertEqual(await self.queue.stats(), {"queued": 0, "processing": 0, "retry": 0, "dead": 1})
+        self.assertEqual(self.handler.messages, [])
+
+    async def test_recover_processing(self):
+        await self.enqueue("user@example.com")
+        self.assertEqual(len(await self.queue.claim(10)), 1)
+        other = MailQueue(self.redis, name="test-mail")
+        # jobs of live worker are not returned to queue
+        self.assertEqual(await other.recover(), 0)
+        self.assertEqual(await other.stats(), {"queued": 0, "processing": 1, "retry": 0, "dead": 0})
+        # lease of claiming worker expired
+        self.assertEqual(await other.recover(now=time.time() + self.queue.lease + 1), 1)
+        self.assertEqual(await other.stats(), {"queued": 1, "processing": 0, "retry": 0, "dead": 0})
+        self.assertEqual(await self.worker.run_once(), 1)
+        self.assertEqual(len(self.handler.messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.db import create_db_engine, pool_stats
+from src.database.pool import MeteredAsyncPool
+from tests.base import DatabaseTestCase
+
+
+class TestPool(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.engine = create_db_engine(f"sqlite:///{self.folder.name}/test_pool.db")
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        del self.engine
+
+    async def test_pool_stats_empty(self):
+        stats = pool_stats(self.engine)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["checkouts"], 0)
+        self.assertEqual(stats["wait_avg_ms"], 0.0)
+
+    async def test_pool_stats_checked_out(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("select 1"))
+            stats = pool_stats(self.engine)
+            self.assertEqual(stats["checked_out"], 1)
+        stats = pool_stats(self.engine)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["idle"], 1)
+        self.assertEqual(stats["checkouts"], 1)
+        self.assertGreaterEqual(stats["wait_max_ms"], stats["wait_avg_ms"])
+
+    async def test_pool_stats_survive_dispose(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("select 1"))
+        await self.engine.dispose()
+        self.assertEqual(pool_stats(self.engine)["checkouts"], 1)
+
+    async def test_pool_stats_concurrent_checkouts(self):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{self.folder.name}/test_pool.db", poolclass=MeteredAsyncPool,
+                                     pool_size=1, max_overflow=0, pool_timeout=0.2)
+
+        async def query(hold: float):
+            async with engine.connect() as conn:
+                await conn.execute(text("select 1"))
+                await asyncio.sleep(hold)
+
+        try:
+            await asyncio.gather(*(query(0.01) for _ in range(5)))
+            stats = pool_stats(engine)
+            self.assertEqual(stats["checkouts"], 5)
+            self.assertEqual(stats["timeouts"], 0)
+            self.assertGreater(stats["wait_max_ms"], 0)
+            results = await asyncio.gather(query(0.5), query(0), query(0), return_exceptions=True)
+            self.assertEqual(sum(isinstance(result, TimeoutError) for result in results), 2)
+            stats = pool_stats(engine)
+            self.assertEqual(stats["checkouts"], 8)
+            self.assertEqual(stats["timeouts"], 2)
+        finally:
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
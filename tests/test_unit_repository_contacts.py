@@ -1,18 +1,22 @@
 import datetime
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock, patch
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Contact, User
 from src.repository.contacts import get_all_contacts, get_contact_by_id, get_contact_, delete_contact, \
-    update_contact_by_id, create_contact, get_upcoming_birthdays
-from src.schemas import ContactModel
+    update_contact_by_id, create_contact, get_upcoming_birthdays, get_contacts_page, encode_cursor, decode_cursor, \
+    upcoming_birthday_mds, patch_contact
+from src.schemas import ContactModel, ContactPatch
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
+        self.contacts_cache = patch("src.repository.contacts.contacts_cache", AsyncMock()).start()
         self.user = User(id=9, name="I", email="I@gmail.com", password="123", update_token=None, email_confirmed=True)
         self.contacts = [Contact(id=1, name="John", soname="Wick", email="John.Wick@gmail.com", phone="123456789",
                                  birthday=datetime.date(1980, 8, 22), info=None, user_id=9),
@@ -23,82 +27,131 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
                                           birthday=datetime.date(1980, 8, 22), info="")
 
     def tearDown(self):
+        patch.stopall()
         del self.contacts
         del self.user
+        del self.result
         del self.session
 
     async def test_get_all_contacts(self):
-        self.session.query().filter_by().offset().limit().all.return_value = self.contacts
+        self.result.scalars().all.return_value = self.contacts
         result = await get_all_contacts(self.session, self.user)
         self.assertListEqual(result, self.contacts)
 
     async def test_get_all_contacts_none(self):
-        self.session.query().filter_by().offset().limit().all.return_value = []
+        self.result.scalars().all.return_value = []
         result = await get_all_contacts(self.session, self.user)
         self.assertEqual(result, [])
 
+    async def test_get_contacts_page_last(self):
+        self.result.scalars().all.return_value = self.contacts
+        result, next_cursor = await get_contacts_page(self.session, self.user, limit=2)
+        self.assertListEqual(result, self.contacts)
+        self.assertIsNone(next_cursor)
+
+    async def test_get_contacts_page_next(self):
+        self.result.scalars().all.return_value = self.contacts
+        result, next_cursor = await get_contacts_page(self.session, self.user, limit=1, cursor=encode_cursor(0))
+        self.assertListEqual(result, self.contacts[:1])
+        self.assertEqual(decode_cursor(next_cursor), self.contacts[0].id)
+
+    async def test_get_contacts_page_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            await get_contacts_page(self.session, self.user, cursor="not a cursor")
+        for contact_id in (-1, 2 ** 63, int("9" * 30)):
+            with self.assertRaises(ValueError):
+                await get_contacts_page(self.session, self.user, cursor=encode_cursor(contact_id))
+
     async def test_get_contact_by_id(self):
         contact = Contact()
-        self.session.query().filter_by().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await get_contact_by_id(self.session, 1, self.user)
         self.assertEqual(result, contact)
 
     async def test_get_contact_name(self):
         contact = Contact()
-        self.session.query().filter_by().all.return_value = contact
-        self.session.query().filter_by().filter_by().all.return_value = contact
+        self.result.scalars().all.return_value = contact
         result1 = await get_contact_(self.session, "str", None, None, user=self.user)
         self.assertEqual(result1, contact)
 
     async def test_get_contact_name_soname(self):
         contact = Contact()
-        self.session.query().filter_by().all.return_value = contact
-        self.session.query().filter_by().filter_by().all.return_value = contact
-        self.session.query().filter_by().filter_by().filter_by().all.return_value = contact
+        self.result.scalars().all.return_value = contact
         result2 = await get_contact_(self.session, "str", "str", None, user=self.user)
         self.assertEqual(result2, contact)
 
     async def test_get_contact_email(self):
         contact = Contact()
-        self.session.query().filter_by().all.return_value = contact
-        self.session.query().filter_by().filter_by().all.return_value = contact
+        self.result.scalars().all.return_value = contact
         result3 = await get_contact_(self.session, None, None, "str", user=self.user)
         self.assertEqual(result3, contact)
 
     async def test_get_contact_none(self):
         contact = Contact()
-        self.session.query().filter_by().all.return_value = contact
+        self.result.scalars().all.return_value = contact
         result4 = await get_contact_(self.session, None, None, None, user=self.user)
         self.assertEqual(result4, contact)
 
     async def test_get_contact_name_soname_email(self):
         contact = Contact()
-        self.session.query().filter_by().all.return_value = contact
-        self.session.query().filter_by().filter_by().filter_by().filter_by().all.return_value = contact
+        self.result.scalars().all.return_value = contact
         result3 = await get_contact_(self.session, "str", "str", "str", user=self.user)
         self.assertEqual(result3, contact)
 
     async def test_delete_contact(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result3 = await delete_contact(self.session, 1, user=self.user)
         self.assertEqual(result3, contact)
+        self.assertIsNotNone(contact.deleted_at)
+        self.session.delete.assert_not_called()
+        self.contacts_cache.bump.assert_awaited_once_with(self.user.id)
 
     async def test_update_contact_by_id(self):
         contact = Contact()
-        self.session.query().filter_by().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result3 = await update_contact_by_id(self.session, 1, self.contact_model, user=self.user)
         self.assertEqual(result3, contact)
+        self.contacts_cache.bump.assert_awaited_once_with(self.user.id)
+
+    async def test_patch_contact(self):
+        contact = Contact()
+        self.result.scalar_one_or_none.return_value = contact
+        result = await patch_contact(self.session, 1, ContactPatch(birthday=datetime.date(1980, 8, 22)), user=self.user)
+        self.assertEqual(result, contact)
+        self.session.execute.assert_awaited_once()
+        sql = str(self.session.execute.call_args.args[0].compile())
+        self.assertIn("SET birth_day=", sql)
+        self.assertIn("birth_md=", sql)
+        self.assertNotIn("phone_number=", sql)
 
     async def test_create_contact(self):
         result3 = await create_contact(self.session, self.contact_model, user=self.user)
         assert self.contact_model.name == result3.name
         self.assertTrue(hasattr(result3, "id"))
+        self.contacts_cache.bump.assert_awaited_once_with(self.user.id)
 
     async def test_get_upcoming_birthdays(self):
-        self.session.query().filter().all.return_value = self.contacts
+        in_3_days = datetime.date.today() + datetime.timedelta(days=3)
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        self.contacts[0].birthday = datetime.date(1980, in_3_days.month, in_3_days.day)
+        self.contacts[1].birthday = datetime.date(1968, tomorrow.month, tomorrow.day)
+        self.result.scalars.return_value = self.contacts
         result3 = await get_upcoming_birthdays(self.session, user=self.user)
-        self.assertEqual(result3, [self.contacts[0]])
+        self.assertEqual(result3, [self.contacts[1], self.contacts[0]])
+
+    def test_upcoming_birthday_mds(self):
+        self.assertListEqual(upcoming_birthday_mds(datetime.date(2023, 8, 20)),
+                             [820, 821, 822, 823, 824, 825, 826, 827])
+
+    def test_upcoming_birthday_mds_new_year(self):
+        self.assertListEqual(upcoming_birthday_mds(datetime.date(2023, 12, 29)),
+                             [1229, 1230, 1231, 101, 102, 103, 104, 105])
+
+    def test_upcoming_birthday_mds_leap_day(self):
+        self.assertIn(229, upcoming_birthday_mds(datetime.date(2023, 2, 25)))
+        self.assertIn(229, upcoming_birthday_mds(datetime.date(2024, 2, 25)))
+        self.assertEqual(upcoming_birthday_mds(datetime.date(2024, 2, 25)).count(229), 1)
 
 
 if __name__ == "__main__":
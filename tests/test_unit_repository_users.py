@@ -1,10 +1,11 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock, patch
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
-from src.repository.users import create_user, get_user_by_email, update_avatar, confirmed_email, update_token
+from src.repository.users import create_user, get_user_by_email, update_avatar, confirmed_email, update_token, \
+    update_password
 from src.schemas import UserModel
 
 
@@ -13,10 +14,15 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.user = User("str", "str@mail.com", "str")
         self.user_model = UserModel(name="str", email="str@mail.com", password='str')
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
+        self.user_cache = patch("src.repository.users.user_cache", AsyncMock()).start()
 
     def tearDown(self):
+        patch.stopall()
         del self.user_model
+        del self.result
         del self.session
         del self.user
 
@@ -27,27 +33,35 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_user_by_email(self):
         user = MagicMock(User)
-        self.session.query().filter_by().first.return_value = user
+        self.result.scalar_one_or_none.return_value = user
         result = await get_user_by_email(self.session, "str@mail.com")
         self.assertEqual(result, user)
 
     async def test_update_avatar(self):
         user = MagicMock(User)
-        self.session.query().filter_by().first.return_value = user
+        self.result.scalar_one_or_none.return_value = user
         result = await update_avatar("str@mail.com", "str", self.session)
         self.assertEqual(result.avatar, user.avatar)
+        self.user_cache.delete.assert_awaited_once_with("str@mail.com")
 
     async def test_confirmed_email(self):
         user = self.user
-        self.session.query().filter_by().first.return_value = user
+        self.result.scalar_one_or_none.return_value = user
         await confirmed_email("str@mail.com", self.session)
         self.assertEqual(user.email_confirmed, True)
+        self.user_cache.delete.assert_awaited_once_with("str@mail.com")
 
     async def test_update_token(self):
         user = self.user
-        self.session.query().filter_by().first.return_value = user
+        self.result.scalar_one_or_none.return_value = user
         await update_token(self.session, user, "str",)
         self.assertEqual(user.update_token, "str")
+        self.user_cache.delete.assert_awaited_once_with(user.email)
+
+    async def test_update_password(self):
+        await update_password(self.session, self.user, "new_hash")
+        self.assertEqual(self.user.password, "new_hash")
+        self.session.commit.assert_awaited_once()
 
 
 if __name__ == "__main__":
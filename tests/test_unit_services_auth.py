@@ -0,0 +1,66 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from jose import JWTError
+
+from src.services.auth import Auth
+from src.services.jwt_backend import JoseBackend, PyJWTBackend
+
+
+class TestJWTBackends(unittest.TestCase):
+
+    def setUp(self):
+        self.claims = {"sub": "I@gmail.com", "scope": "access_token", "exp": int(time.time()) + 60}
+
+    def tearDown(self):
+        del self.claims
+
+    def test_roundtrip(self):
+        for backend in (JoseBackend("secret", "HS256"), PyJWTBackend("secret", "HS256")):
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(backend.decode(backend.encode(self.claims)), self.claims)
+
+    def test_compatible(self):
+        token = JoseBackend("secret", "HS256").encode(self.claims)
+        self.assertEqual(PyJWTBackend("secret", "HS256").decode(token), self.claims)
+
+    def test_invalid_signature(self):
+        for backend in (JoseBackend, PyJWTBackend):
+            with self.subTest(backend=backend.__name__):
+                token = backend("other", "HS256").encode(self.claims)
+                with self.assertRaises(JWTError):
+                    backend("secret", "HS256").decode(token)
+
+    def test_expired(self):
+        self.claims["exp"] = int(time.time()) - 60
+        for backend in (JoseBackend("secret", "HS256"), PyJWTBackend("secret", "HS256")):
+            with self.subTest(backend=type(backend).__name__):
+                with self.assertRaises(JWTError):
+                    backend.decode(backend.encode(self.claims))
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.jwt_backend = MagicMock(wraps=JoseBackend("secret", "HS256"))
+
+    def tearDown(self):
+        del self.auth
+
+    def test_decode_access_token_cached(self):
+        token = self.auth.jwt_backend.encode({"sub": "I@gmail.com", "exp": int(time.time()) + 60})
+        self.assertEqual(self.auth.decode_access_token(token)["sub"], "I@gmail.com")
+        self.assertEqual(self.auth.decode_access_token(token)["sub"], "I@gmail.com")
+        self.auth.jwt_backend.decode.assert_called_once()
+        self.assertEqual(self.auth.token_cache.stats()["hits"], 1)
+
+    def test_decode_access_token_invalid_not_cached(self):
+        with self.assertRaises(JWTError):
+            self.auth.decode_access_token("invalid")
+        self.assertEqual(self.auth.token_cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fakeredis.aioredis import FakeRedis
+from redis.exceptions import ConnectionError
+
+from src.database.models import User
+from src.services.cache import ContactsCache, UserCache, LocalCache
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.cache = UserCache(self.redis, ttl=60, local=LocalCache(maxsize=2, ttl=30))
+        self.user = User(id=9, name="I", email="I@gmail.com", password="hash", update_token="token",
+                         avatar="http://avatar", email_confirmed=True)
+
+    def tearDown(self):
+        del self.cache
+        del self.redis
+        del self.user
+
+    async def test_set_single_round_trip(self):
+        await self.cache.set(self.user)
+        self.redis.set.assert_awaited_once()
+        key, data = self.redis.set.call_args.args
+        self.assertEqual(key, f"user:v{UserCache.VERSION}:I@gmail.com")
+        self.assertEqual(self.redis.set.call_args.kwargs, {"ex": 60})
+        self.assertNotIn("hash", json.loads(data).values())
+        self.assertNotIn("token", json.loads(data).values())
+
+    async def test_get(self):
+        self.redis.get.return_value = UserCache.dumps(self.user)
+        user = await self.cache.get("I@gmail.com")
+        self.assertIsInstance(user, User)
+        self.assertEqual((user.id, user.email, user.avatar, user.email_confirmed), (9, "I@gmail.com", "http://avatar", True))
+        self.assertIsNone(user.password)
+
+    async def test_get_miss(self):
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get("I@gmail.com"))
+
+    async def test_get_local_hit(self):
+        self.redis.get.return_value = UserCache.dumps(self.user)
+        await self.cache.get("I@gmail.com")
+        user = await self.cache.get("I@gmail.com")
+        self.assertEqual(user.id, 9)
+        self.redis.get.assert_awaited_once()
+        self.assertEqual(self.cache.local.stats()["hits"], 1)
+
+    async def test_delete_publish(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        self.redis.pipeline = MagicMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = pipe
+        await self.cache.set(self.user)
+        await self.cache.delete("I@gmail.com")
+        pipe.publish.assert_called_once_with(UserCache.CHANNEL, "I@gmail.com")
+        pipe.execute.assert_awaited_once()
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get("I@gmail.com"))
+
+    async def test_redis_unavailable(self):
+        self.redis.get = AsyncMock(side_effect=ConnectionError)
+        self.redis.set = AsyncMock(side_effect=ConnectionError)
+        self.assertIsNone(await self.cache.get("I@gmail.com"))
+        await self.cache.set(self.user)
+
+
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeRedis()
+        self.cache = ContactsCache(self.redis, ttl=60, version_ttl=300)
+
+    async def asyncTearDown(self):
+        await self.redis.aclose()
+
+    async def test_bump(self):
+        version = await self.cache.version(1)
+        await self.cache.bump(1)
+        self.assertGreater(await self.cache.version(1), version)
+        self.assertLessEqual(await self.redis.ttl(self.cache.version_key(1)), 300)
+
+    async def test_bump_failed_version_removed(self):
+        version = await self.cache.version(1)
+        with patch.object(self.redis, "pipeline", MagicMock(side_effect=ConnectionError)):
+            await self.cache.bump(1)
+        self.assertNotEqual(await self.cache.version(1), version)
+
+    async def test_bump_failed_version_not_used(self):
+        await self.cache.version(1)
+        with patch.object(self.redis, "pipeline", MagicMock(side_effect=ConnectionError)), \
+                patch.object(self.redis, "delete", AsyncMock(side_effect=ConnectionError)):
+            await self.cache.bump(1)
+        self.assertIsNone(await self.cache.version(1))
+        self.assertIsNotNone(await self.cache.version(2))
+        self.cache._unversioned[1] = 0
+        self.assertIsNotNone(await self.cache.version(1))
+
+
+class TestLocalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LocalCache(maxsize=2, ttl=30)
+
+    def tearDown(self):
+        del self.cache
+
+    def test_lru_eviction(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["size"], 2)
+
+    def test_ttl(self):
+        self.cache.set("a", 1)
+        with patch("src.services.cache.time.monotonic", return_value=10 ** 9):
+            self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_stats(self):
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        self.cache.get("b")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_ratio"]), (1, 1, 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
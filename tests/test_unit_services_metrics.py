@@ -0,0 +1,47 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.services.metrics import RequestTimings, instrument_engine, record, _timings
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        instrument_engine(self.engine)
+        self.timings = RequestTimings()
+        self.token = _timings.set(self.timings)
+
+    async def asyncTearDown(self):
+        _timings.reset(self.token)
+        await self.engine.dispose()
+
+    async def test_sql_statements_counted(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("select 1"))
+            await conn.execute(text("select 2"))
+            with self.assertRaises(OperationalError):
+                await conn.execute(text("select * from missing"))
+            await conn.execute(text("select 3"))
+        self.assertEqual(self.timings.count("db"), 3)
+
+    async def test_server_timing(self):
+        record("redis", 0.002, "GET")
+        record("redis", 0.001, "SET")
+        record("jwt", 0.0005)
+        header = self.timings.server_timing()
+        self.assertIn('redis;desc="2 calls";dur=3.00', header)
+        self.assertIn('jwt;desc="1 calls";dur=0.50', header)
+        self.assertTrue(header.split(", ")[-1].startswith("app;dur="))
+
+    def test_record_outside_request(self):
+        _timings.set(None)
+        record("db", 0.01)
+        self.assertEqual(self.timings.count("db"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
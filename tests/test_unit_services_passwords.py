@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from fastapi import HTTPException
+
+from src.services.passwords import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(rounds=4, workers=2, max_queue=2)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+        del self.hasher
+
+    async def test_hash_verify(self):
+        hashed = await self.hasher.hash("123456789")
+        self.assertEqual(await self.hasher.verify_and_update("123456789", hashed), (True, None))
+        self.assertEqual(await self.hasher.verify_and_update("password", hashed), (False, None))
+        self.assertEqual(self.hasher.stats()["completed"], 3)
+
+    async def test_upgrade_cost(self):
+        hashed = await PasswordHasher(rounds=5).hash("123456789")
+        verified, new_hash = await self.hasher.verify_and_update("123456789", hashed)
+        self.assertTrue(verified)
+        self.assertTrue(new_hash.startswith("$2b$04$"))
+
+    async def test_queue_limit(self):
+        calls = [self.hasher.hash("123456789") for _ in range(5)]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        rejected = [result for result in results if isinstance(result, HTTPException)]
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(rejected[0].status_code, 503)
+        self.assertEqual(self.hasher.stats()["rejected"], 1)
+
+    async def test_process_executor(self):
+        hasher = PasswordHasher(rounds=4, workers=1, executor="process")
+        try:
+            hashed = await hasher.hash("123456789")
+            self.assertEqual(await hasher.verify_and_update("123456789", hashed), (True, None))
+        finally:
+            hasher.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+
+from fakeredis.aioredis import FakeRedis
+from redis.exceptions import ConnectionError
+
+from src.services.rate_limit import RateLimiter, LocalWindows, parse_limit
+
+NOW = 1_000_000.0  # start of 5 and 10 seconds windows
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.clock = patch("src.services.rate_limit.time.time", return_value=NOW)
+        self.time = self.clock.start()
+
+    def tearDown(self):
+        self.clock.stop()
+
+    async def asyncTearDown(self):
+        await self.redis.aclose()
+
+    async def test_limit_in_window(self):
+        limiter = RateLimiter(self.redis)
+        self.assertEqual(await limiter.hit("route:1", 2, 5), 0)
+        self.assertEqual(await limiter.hit("route:1", 2, 5), 0)
+        self.assertEqual(await limiter.hit("route:1", 2, 5), 5)
+        self.assertEqual(await limiter.hit("route:2", 2, 5), 0)
+        self.assertEqual(limiter.stats()["rejected"], 1)
+
+    async def test_sliding_window_counts_previous_window(self):
+        limiter = RateLimiter(self.redis)
+        for _ in range(4):
+            self.assertEqual(await limiter.hit("route:1", 4, 10), 0)
+        # half of previous window is still inside sliding window: 4 * 0.5 = 2 requests used
+        self.time.return_value = NOW + 15
+        self.assertEqual(await limiter.hit("route:1", 4, 10), 0)
+        self.assertEqual(await limiter.hit("route:1", 4, 10), 0)
+        retry = await limiter.hit("route:1", 4, 10)
+        self.assertGreater(retry, 0)
+        self.assertLessEqual(retry, 5)
+        self.time.return_value = NOW + 15 + retry
+        self.assertEqual(await limiter.hit("route:1", 4, 10), 0)
+
+    async def test_local_token_batch(self):
+        limiter = RateLimiter(self.redis, batch=3)
+        for _ in range(5):
+            self.assertEqual(await limiter.hit("route:1", 5, 5), 0)
+        self.assertGreater(await limiter.hit("route:1", 5, 5), 0)
+        stats = limiter.stats()
+        self.assertEqual(stats["redis_calls"], 3)
+        self.assertEqual(stats["local_hits"], 3)
+        # tokens of other worker are counted in Redis
+        other = RateLimiter(self.redis, batch=3)
+        self.assertGreater(await other.hit("route:1", 5, 5), 0)
+
+    async def test_tokens_expire_with_window(self):
+        limiter = RateLimiter(self.redis, batch=3)
+        await limiter.hit("route:1", 5, 5)
+        self.time.return_value = NOW + 5
+        await limiter.hit("route:1", 5, 5)
+        self.assertEqual(limiter.stats()["redis_calls"], 2)
+
+    async def test_redis_unavailable(self):
+        limiter = RateLimiter(self.redis, cooldown=30)
+        with patch.object(limiter, "script", side_effect=ConnectionError):
+            self.assertEqual(await limiter.hit("route:1", 2, 5), 0)
+            self.assertEqual(await limiter.hit("route:1", 2, 5), 0)
+            self.assertGreater(await limiter.hit("route:1", 2, 5), 0)
+        stats = limiter.stats()
+        self.assertEqual(stats["redis_errors"], 1)
+        self.assertFalse(stats["redis_available"])
+        self.time.return_value = NOW + 31
+        self.assertEqual(await limiter.hit("route:1", 2, 5), 0)
+        self.assertEqual(limiter.stats()["redis_calls"], 2)
+
+    async def test_disabled(self):
+        limiter = RateLimiter(self.redis, enabled=False)
+        for _ in range(5):
+            self.assertEqual(await limiter.hit("route:1", 1, 5), 0)
+
+
+class TestLocalWindows(unittest.TestCase):
+
+    def test_hit(self):
+        windows = LocalWindows()
+        self.assertEqual(windows.hit("a", 1, 5, NOW), 0)
+        self.assertEqual(windows.hit("a", 1, 5, NOW + 1), 4)
+        self.assertEqual(windows.hit("a", 1, 5, NOW + 10), 0)
+
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit("2/5"), (2, 5.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
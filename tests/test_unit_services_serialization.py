@@ -0,0 +1,31 @@
+import datetime
+import json
+import unittest
+
+from pydantic import TypeAdapter
+
+from src.database.models import Contact
+from src.schemas import ContactResponse
+from src.services.serialization import contact_rows_json
+
+
+class TestContactRowsJson(unittest.TestCase):
+
+    def test_same_as_validated_response(self):
+        rows = [
+            (1, "John", "Wick", "john.wick@gmail.com", "123456789", datetime.date(1980, 8, 22), ""),
+            (2, "Ozzy", "Осборн", "ozzy@gmail.com", "666", datetime.date(1968, 12, 3), 'sings "Paranoid"\n\\ \t'),
+        ]
+        contacts = [Contact(id=r[0], name=r[1], soname=r[2], email=r[3], phone=r[4], birthday=r[5], info=r[6])
+                    for r in rows]
+        adapter = TypeAdapter(list[ContactResponse])
+        expected = adapter.dump_json(adapter.validate_python(contacts, from_attributes=True))
+        self.assertEqual(contact_rows_json(rows), expected)
+        self.assertEqual(json.loads(contact_rows_json(rows))[1]["soname"], "Осборн")
+
+    def test_empty(self):
+        self.assertEqual(contact_rows_json([]), b"[]")
+
+
+if __name__ == '__main__':
+    unittest.main()